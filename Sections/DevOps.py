@@ -1,28 +1,41 @@
 import streamlit as st
-import subprocess
 import json
 import requests
 import yaml
 import os
-from datetime import datetime
+import sqlite3
+import pandas as pd
+import csv
+import difflib
+import fnmatch
+import gzip
+import hashlib
+import heapq
+import io
+import itertools
+import re
+import shlex
+import tarfile
+import threading
+import time
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from urllib.parse import quote
 import paramiko
-from typing import Tuple
+from kubernetes import client as k8s_client, config as k8s_config, dynamic as k8s_dynamic, watch as k8s_watch
+from kubernetes.client.rest import ApiException
+from kubernetes.utils import parse_quantity
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import Dict, List, Optional, Tuple
 
 def log_command(command):
     """Log command to file"""
     with open("command_log.txt", "a") as f:
         f.write(f"{datetime.now()}: {command}\n")
 
-def run_command(command, shell=True):
-    """Run shell command and return result"""
-    try:
-        result = subprocess.run(command, shell=shell, capture_output=True, text=True, timeout=30)
-        return result.returncode == 0, result.stdout, result.stderr
-    except subprocess.TimeoutExpired:
-        return False, "", "Command timed out"
-    except Exception as e:
-        return False, "", str(e)
-
 def run_ssh_command(command: str, client: paramiko.SSHClient) -> Tuple[str, str]:
     try:
         stdin, stdout, stderr = client.exec_command(command)
@@ -32,6 +45,827 @@ def run_ssh_command(command: str, client: paramiko.SSHClient) -> Tuple[str, str]
     except Exception as e:
         return '', str(e)
 
+def run_ssh_command_checked(command: str, client: paramiko.SSHClient) -> str:
+    """Run a command over SSH and raise if it exits non-zero; warnings on stderr are not errors"""
+    stdin, stdout, stderr = client.exec_command(command)
+    output = stdout.read().decode()
+    error = stderr.read().decode()
+    if stdout.channel.recv_exit_status() != 0:
+        raise RuntimeError(error.strip() or f"'{command}' failed")
+    return output
+
+def format_bytes(num_bytes) -> str:
+    """Format a byte count the way the docker CLI does (decimal units)"""
+    size = float(num_bytes or 0)
+    for unit in ["B", "kB", "MB", "GB", "TB"]:
+        if abs(size) < 1000 or unit == "TB":
+            return f"{size:.1f}{unit}" if unit != "B" else f"{int(size)}B"
+        size /= 1000
+
+# Event actions after which an object no longer exists on the daemon
+DOCKER_REMOVAL_ACTIONS = {
+    "container": {"destroy"},
+    "image": {"delete"},
+    "network": {"destroy"},
+    "volume": {"destroy"},
+}
+
+DOCKER_LIST_IDS = {
+    "container": "docker ps -aq --no-trunc",
+    "image": "docker images -q --no-trunc",
+    "network": "docker network ls -q --no-trunc",
+    "volume": "docker volume ls -q",
+}
+
+def docker_inspect(client: paramiko.SSHClient, kind: str, ids: List[str]) -> Tuple[List[dict], str]:
+    """Inspect docker objects of one kind and return the parsed JSON list"""
+    if not ids:
+        return [], ''
+    output, error = run_ssh_command(f"docker {kind} inspect {' '.join(shlex.quote(i) for i in ids)}", client)
+    try:
+        return json.loads(output or "[]"), error
+    except json.JSONDecodeError:
+        return [], error or "Could not parse docker inspect output"
+
+def docker_object_key(kind: str, obj: dict) -> str:
+    """Stable key of an inspected docker object (volumes are keyed by name)"""
+    return obj.get("Name", "") if kind == "volume" else obj.get("Id", "")
+
+class DockerStateCache:
+    """In-memory model of containers, images, networks and volumes on a docker host.
+
+    A background thread takes one inspect snapshot per object kind and then
+    follows ``docker events``, re-inspecting only the object an event refers
+    to. Streamlit reruns read from the cache without touching the host.
+    """
+
+    def __init__(self, client: paramiko.SSHClient):
+        self.client = client
+        self.objects: Dict[str, Dict[str, dict]] = {kind: {} for kind in DOCKER_LIST_IDS}
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.last_event = None
+        self.event_count = 0
+        self.error = ''
+        self._channel = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def snapshot(self):
+        """Replace the cache with a fresh inspect of every object"""
+        fresh = {}
+        for kind, list_cmd in DOCKER_LIST_IDS.items():
+            output = run_ssh_command_checked(list_cmd, self.client)
+            objs, error = docker_inspect(self.client, kind, output.split())
+            fresh[kind] = {docker_object_key(kind, obj): obj for obj in objs}
+        with self.lock:
+            self.objects = fresh
+        self.ready.set()
+
+    def refresh_object(self, kind: str, object_id: str, action: str):
+        """Apply one docker event to the cache"""
+        if kind not in self.objects or not object_id:
+            return
+        if action not in DOCKER_REMOVAL_ACTIONS[kind]:
+            objs, error = docker_inspect(self.client, kind, [object_id])
+            if objs:
+                with self.lock:
+                    for obj in objs:
+                        self.objects[kind][docker_object_key(kind, obj)] = obj
+                return
+        # Removed, or gone by the time we inspected it (e.g. untag of last tag)
+        with self.lock:
+            self.objects[kind].pop(object_id, None)
+
+    def _run(self):
+        backoff = 1
+        while not self.stopped.is_set():
+            try:
+                since = int(time.time())
+                # Subscribe before snapshotting so nothing between the two is missed;
+                # replayed events only trigger re-inspection, which is idempotent.
+                stdin, stdout, stderr = self.client.exec_command(
+                    "docker events --format '{{json .}}' "
+                    "--filter type=container --filter type=image --filter type=network --filter type=volume"
+                )
+                self._channel = stdout.channel
+                self.snapshot()
+                self.error = ''
+                backoff = 1
+                for line in iter(stdout.readline, ""):
+                    if self.stopped.is_set():
+                        break
+                    try:
+                        event = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    action = event.get("Action", "").split(":")[0]
+                    if action.startswith("exec_") or action in ("attach", "resize", "top"):
+                        continue
+                    kind = event.get("Type", "")
+                    actor = event.get("Actor", {})
+                    self.refresh_object(kind, actor.get("ID", ""), action)
+                    # Network membership is part of the container's inspect output
+                    if kind == "network" and actor.get("Attributes", {}).get("container"):
+                        self.refresh_object("container", actor["Attributes"]["container"], "update")
+                    self.last_event = datetime.fromtimestamp(event.get("time", since))
+                    self.event_count += 1
+            except Exception as e:
+                self.error = str(e)
+            finally:
+                if self._channel is not None:
+                    self._channel.close()
+            if not self.stopped.is_set():
+                self.stopped.wait(backoff)
+                backoff = min(backoff * 2, 30)
+
+    def stop(self):
+        self.stopped.set()
+        if self._channel is not None:
+            self._channel.close()
+
+    def rows(self, kind: str) -> List[dict]:
+        """Flattened table rows for one object kind"""
+        with self.lock:
+            objs = list(self.objects.get(kind, {}).values())
+        if kind == "container":
+            return [{
+                "Name": obj.get("Name", "").lstrip("/"),
+                "ID": obj.get("Id", "")[:12],
+                "Image": obj.get("Config", {}).get("Image", ""),
+                "State": obj.get("State", {}).get("Status", ""),
+                "Health": (obj.get("State", {}).get("Health") or {}).get("Status", ""),
+                "Restarts": obj.get("RestartCount", 0),
+                "Ports": ", ".join(
+                    f"{b['HostPort']}->{port}" for port, binds in (obj.get("NetworkSettings", {}).get("Ports") or {}).items()
+                    for b in (binds or [])
+                ),
+                "Created": obj.get("Created", "")[:19],
+            } for obj in objs]
+        if kind == "image":
+            return [{
+                "Tags": ", ".join(obj.get("RepoTags") or ["<none>"]),
+                "ID": obj.get("Id", "").replace("sha256:", "")[:12],
+                "Size": format_bytes(obj.get("Size", 0)),
+                "Created": obj.get("Created", "")[:19],
+            } for obj in objs]
+        if kind == "network":
+            return [{
+                "Name": obj.get("Name", ""),
+                "ID": obj.get("Id", "")[:12],
+                "Driver": obj.get("Driver", ""),
+                "Scope": obj.get("Scope", ""),
+                "Containers": len(obj.get("Containers") or {}),
+            } for obj in objs]
+        return [{
+            "Name": obj.get("Name", ""),
+            "Driver": obj.get("Driver", ""),
+            "Mountpoint": obj.get("Mountpoint", ""),
+            "Created": obj.get("CreatedAt", "")[:19],
+        } for obj in objs]
+
+def get_docker_state_cache(client: paramiko.SSHClient) -> DockerStateCache:
+    """Return the session's docker state cache, starting one for a new connection"""
+    cache = st.session_state.get("docker_state_cache")
+    if cache is None or cache.client is not client or cache.stopped.is_set():
+        if cache is not None:
+            cache.stop()
+        cache = DockerStateCache(client)
+        st.session_state.docker_state_cache = cache
+    return cache
+
+def render_docker_state(cache: DockerStateCache, kind: str, label: str):
+    """Render one object kind from the state cache"""
+    if not cache.ready.is_set():
+        st.info(f"Loading {label} from the Docker host...")
+        return
+    rows = cache.rows(kind)
+    if rows:
+        st.dataframe(rows, use_container_width=True)
+    else:
+        st.info(f"No {label} found.")
+
+class ChannelWriter:
+    """File-like adapter that streams writes into an SSH channel"""
+
+    def __init__(self, channel):
+        self.channel = channel
+
+    def write(self, data):
+        self.channel.sendall(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+def read_dockerignore(context_dir: str) -> List[str]:
+    """Read exclusion patterns from a build context's .dockerignore"""
+    path = os.path.join(context_dir, ".dockerignore")
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        lines = [line.strip() for line in f]
+    return [line.rstrip("/") for line in lines if line and not line.startswith("#") and not line.startswith("!")]
+
+def is_dockerignored(rel_path: str, patterns: List[str]) -> bool:
+    """Check a context-relative path (or any parent dir) against .dockerignore patterns"""
+    parts = rel_path.split("/")
+    return any(
+        fnmatch.fnmatch("/".join(parts[:i]), pattern)
+        for pattern in patterns for i in range(1, len(parts) + 1)
+    )
+
+def write_build_context(channel, source: str, context) -> None:
+    """Stream a build context to the docker daemon's stdin as a gzipped tar.
+
+    ``context`` is a local directory path for "Local directory", or a list of
+    Streamlit uploads for "Upload". A single uploaded tar/tar.gz is passed
+    through untouched; a zip is re-packed as tar on the fly.
+    """
+    writer = ChannelWriter(channel)
+    if source == "Upload" and len(context) == 1 and context[0].name.endswith((".tar", ".tar.gz", ".tgz")):
+        upload = context[0]
+        upload.seek(0)
+        for chunk in iter(lambda: upload.read(1024 * 1024), b""):
+            writer.write(chunk)
+        return
+    with gzip.GzipFile(fileobj=writer, mode="wb", compresslevel=3) as gz:
+        with tarfile.open(fileobj=gz, mode="w|") as tar:
+            if source == "Local directory":
+                patterns = read_dockerignore(context)
+                for root, dirs, files in os.walk(context):
+                    rel_root = os.path.relpath(root, context).replace(os.sep, "/")
+                    rel_root = "" if rel_root == "." else rel_root + "/"
+                    dirs[:] = [d for d in dirs if not is_dockerignored(rel_root + d, patterns)]
+                    for name in files:
+                        rel_path = rel_root + name
+                        if rel_path != "Dockerfile" and is_dockerignored(rel_path, patterns):
+                            continue
+                        tar.add(os.path.join(root, name), arcname=rel_path, recursive=False)
+            elif len(context) == 1 and context[0].name.endswith(".zip"):
+                with zipfile.ZipFile(context[0]) as zf:
+                    for info in zf.infolist():
+                        if info.is_dir():
+                            continue
+                        tar_info = tarfile.TarInfo(info.filename)
+                        tar_info.size = info.file_size
+                        tar_info.mtime = time.mktime(info.date_time + (0, 0, -1))
+                        with zf.open(info) as member:
+                            tar.addfile(tar_info, member)
+            else:
+                for upload in context:
+                    upload.seek(0, os.SEEK_END)
+                    tar_info = tarfile.TarInfo(upload.name)
+                    tar_info.size = upload.tell()
+                    tar_info.mtime = time.time()
+                    upload.seek(0)
+                    tar.addfile(tar_info, upload)
+
+BUILDKIT_STEP = re.compile(r"^#(\d+) (\[[^\]]+\] .*)$")
+BUILDKIT_DONE = re.compile(r"^#(\d+) DONE (\d+(?:\.\d+)?)s")
+BUILDKIT_CACHED = re.compile(r"^#(\d+) CACHED")
+LEGACY_STEP = re.compile(r"^Step (\d+/\d+) : (.*)$")
+
+class BuildStepTracker:
+    """Collect per-step timing and cache hits from docker build output.
+
+    Understands BuildKit's ``--progress=plain`` lines (``#5 [2/4] RUN ...``,
+    ``#5 CACHED``, ``#5 DONE 1.2s``) and the legacy builder's ``Step 2/4 :``
+    format, where durations are measured between consecutive steps.
+    """
+
+    def __init__(self):
+        self.steps: Dict[str, dict] = {}
+        self._legacy_current = None
+
+    def feed(self, line: str):
+        line = line.rstrip()
+        match = BUILDKIT_STEP.match(line)
+        if match and match.group(1) not in self.steps:
+            self.steps[match.group(1)] = {"Step": match.group(2), "Cached": False, "Duration (s)": None}
+            return
+        match = BUILDKIT_CACHED.match(line)
+        if match and match.group(1) in self.steps:
+            self.steps[match.group(1)]["Cached"] = True
+            self.steps[match.group(1)]["Duration (s)"] = 0.0
+            return
+        match = BUILDKIT_DONE.match(line)
+        if match and match.group(1) in self.steps:
+            self.steps[match.group(1)]["Duration (s)"] = float(match.group(2))
+            return
+        match = LEGACY_STEP.match(line)
+        if match:
+            self._finish_legacy_step()
+            self._legacy_current = match.group(1)
+            self.steps[self._legacy_current] = {
+                "Step": f"[{match.group(1)}] {match.group(2)}", "Cached": False,
+                "Duration (s)": None, "_started": time.time(),
+            }
+        elif self._legacy_current and "Using cache" in line:
+            self.steps[self._legacy_current]["Cached"] = True
+        elif self._legacy_current and line.startswith("Successfully built"):
+            self._finish_legacy_step()
+
+    def _finish_legacy_step(self):
+        if self._legacy_current:
+            step = self.steps[self._legacy_current]
+            step["Duration (s)"] = round(time.time() - step.pop("_started"), 2)
+            self._legacy_current = None
+
+    def report(self) -> List[dict]:
+        """Instruction steps only; BuildKit's internal steps (load context etc.) are dropped"""
+        return [
+            {k: v for k, v in step.items() if not k.startswith("_")}
+            for step in self.steps.values()
+            if not step["Step"].startswith("[internal]") and not step["Step"].startswith("[auth]")
+        ]
+
+def stream_docker_build(client: paramiko.SSHClient, command: str, source: str, context, placeholder,
+                        tail_lines: int = 40) -> Tuple[int, List[str], BuildStepTracker]:
+    """Run docker build remotely, streaming the context in and the log out as it happens"""
+    channel = client.get_transport().open_session()
+    channel.set_combined_stderr(True)
+    channel.exec_command(command)
+
+    upload_error = []
+
+    def upload():
+        try:
+            if source != "Remote path":
+                write_build_context(channel, source, context)
+        except Exception as e:
+            upload_error.append(str(e))
+        finally:
+            channel.shutdown_write()
+
+    uploader = threading.Thread(target=upload, daemon=True)
+    uploader.start()
+
+    tracker = BuildStepTracker()
+    lines: List[str] = []
+    last_render = 0.0
+    for raw in iter(channel.makefile("rb").readline, b""):
+        line = raw.decode(errors="replace").rstrip("\n")
+        lines.append(line)
+        tracker.feed(line)
+        if time.time() - last_render > 0.3:
+            placeholder.code("\n".join(lines[-tail_lines:]), language="bash")
+            last_render = time.time()
+    placeholder.code("\n".join(lines[-tail_lines:]), language="bash")
+    uploader.join()
+    lines.extend(f"context upload failed: {e}" for e in upload_error)
+    return channel.recv_exit_status(), lines, tracker
+
+def render_build_report(tracker: BuildStepTracker):
+    """Show per-step timing and cache hit/miss statistics for a finished build"""
+    steps = tracker.report()
+    if not steps:
+        return
+    timed = [s for s in steps if s["Duration (s)"] is not None]
+    hits = sum(1 for s in steps if s["Cached"])
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Steps", len(steps))
+    with col2:
+        st.metric("Cache Hits", hits)
+    with col3:
+        st.metric("Cache Misses", len(steps) - hits)
+    with col4:
+        st.metric("Step Time", f"{sum(s['Duration (s)'] for s in timed):.1f}s")
+    st.dataframe(sorted(steps, key=lambda s: -(s["Duration (s)"] or 0)), use_container_width=True)
+
+def log_sort_key(timestamp: str) -> str:
+    """Sortable form of an RFC3339Nano timestamp (the fraction is trimmed of zeros by docker/k8s)"""
+    timestamp = timestamp.rstrip("Z")
+    whole, _, fraction = timestamp.partition(".")
+    return f"{whole}.{fraction.ljust(9, '0')[:9]}"
+
+def merge_log_buffers(buffers: Dict[str, deque], limit: int) -> List[Tuple[str, str, str]]:
+    """Merge per-source buffers of (timestamp, line) into the newest ``limit`` lines in time order"""
+    streams = [
+        [(log_sort_key(ts), source, ts, line) for ts, line in list(buffer)]
+        for source, buffer in buffers.items()
+    ]
+    merged = list(heapq.merge(*streams))
+    return [(ts, source, line) for _, source, ts, line in merged[-limit:]]
+
+DOCKER_LOG_FILTER = "awk '{ if (substr($0, length($1) + 2) ~ ENVIRON[\"LOG_PATTERN\"]) { print; fflush() } }'"
+
+def check_docker_log_pattern(client: paramiko.SSHClient, pattern: str):
+    """Compile ``pattern`` with the docker host's awk, raising if it is not a valid POSIX ERE"""
+    run_ssh_command_checked(f"LOG_PATTERN={shlex.quote(pattern)} "
+                            "awk 'BEGIN { if (\"\" ~ ENVIRON[\"LOG_PATTERN\"]) {} }'", client)
+
+class DockerLogFollower:
+    """Tail one container's logs over SSH into a bounded scrollback.
+
+    ``--since``/``--tail`` and the regex filter are applied on the docker host,
+    so only matching lines cross the connection. The filter is a POSIX ERE run
+    by awk against the line without its ``--timestamps`` prefix, so anchors
+    like ``^ERROR`` work; awk errors end the follower with its stderr as error.
+    """
+
+    def __init__(self, client: paramiko.SSHClient, container: str, since: str, tail: int,
+                 pattern: str, follow: bool, scrollback: int):
+        self.container = container
+        self.settings = (since, tail, pattern, follow, scrollback)
+        self.buffer: deque = deque(maxlen=scrollback)
+        self.running = True
+        self.error = ''
+        self._stopped = False
+        command = f"docker logs --timestamps --tail {int(tail)}"
+        if since:
+            command += f" --since {shlex.quote(since)}"
+        if follow:
+            command += " --follow"
+        command += f" {shlex.quote(container)} 2>&1"
+        if pattern:
+            command += f" | LOG_PATTERN={shlex.quote(pattern)} {DOCKER_LOG_FILTER}"
+        self._channel = client.get_transport().open_session()
+        self._channel.exec_command(command)
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            for raw in iter(self._channel.makefile("rb").readline, b""):
+                ts, _, line = raw.decode(errors="replace").rstrip("\n").partition(" ")
+                self.buffer.append((ts, line))
+            if not self._stopped and self._channel.recv_exit_status() != 0:
+                self.error = self._channel.makefile_stderr("rb").read().decode(errors="replace").strip()
+        except Exception as e:
+            if not self._stopped:
+                self.error = str(e)
+        finally:
+            self.running = False
+
+    def stop(self):
+        self._stopped = True
+        self._channel.close()
+
+def render_docker_logs_panel(client: paramiko.SSHClient, state_cache: DockerStateCache):
+    """Follow logs of several containers concurrently and show them merged by timestamp"""
+    followers: Dict[str, DockerLogFollower] = st.session_state.setdefault("docker_log_followers", {})
+    container_names = sorted(row["Name"] for row in state_cache.rows("container"))
+    selected = st.multiselect("Containers", container_names, key="docker_logs_containers")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        since = st.text_input("Since (e.g. 10m, 1h, 2024-01-01T00:00:00)", value="10m", key="docker_logs_since")
+    with col2:
+        tail = st.number_input("Tail (lines per container)", min_value=1, max_value=100000, value=500, key="docker_logs_tail")
+    with col3:
+        pattern = st.text_input("Filter (POSIX ERE, without timestamp)", key="docker_logs_pattern",
+                                help="Evaluated by awk on the docker host: no \\d, (?i) or lazy quantifiers")
+    with col4:
+        scrollback = st.number_input("Scrollback (lines)", min_value=100, max_value=50000, value=2000, key="docker_logs_scrollback")
+    follow = st.checkbox("Follow", value=True, key="docker_logs_follow")
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("▶️ Start Tailing") and selected:
+            if pattern:
+                try:
+                    check_docker_log_pattern(client, pattern)
+                except Exception as e:
+                    st.error(f"Invalid filter: {e}")
+                    return
+            settings = (since, int(tail), pattern, follow, int(scrollback))
+            for name in list(followers):
+                if name not in selected or followers[name].settings != settings:
+                    followers.pop(name).stop()
+            for name in selected:
+                if name not in followers:
+                    followers[name] = DockerLogFollower(client, name, *settings)
+            log_command(f"Docker: Tailing logs for {', '.join(selected)}")
+    with col2:
+        if st.button("⏹️ Stop Tailing"):
+            for follower in followers.values():
+                follower.stop()
+            followers.clear()
+
+    if not followers:
+        st.info("Select containers and start tailing to see their logs.")
+        return
+
+    status = ", ".join(f"{name} ({'following' if f.running else 'stopped'})" for name, f in followers.items())
+    st.caption(f"Tailing: {status}")
+    for name, follower in followers.items():
+        if follower.error:
+            st.error(f"{name}: {follower.error}")
+
+    view_lines = st.slider("Lines to show", 50, 2000, 300, 50, key="docker_logs_view")
+    # One snapshot per rerun: the followers keep reading in the background, so
+    # the rest of the page never waits on the log view
+    st.button("🔄 Refresh Logs", key="docker_logs_refresh")
+    merged = merge_log_buffers({name: f.buffer for name, f in followers.items()}, view_lines)
+    st.code("\n".join(f"[{source}] {ts} {line}" for ts, source, line in merged) or "(no lines yet)")
+
+def load_compose_project(client: paramiko.SSHClient, compose_path: str) -> dict:
+    """Read a compose file from the docker host over SFTP and parse it locally"""
+    sftp = client.open_sftp()
+    try:
+        abs_path = sftp.normalize(compose_path)
+        with sftp.open(abs_path) as f:
+            spec = yaml.safe_load(f.read()) or {}
+    finally:
+        sftp.close()
+    # Same default as docker compose: the name of the directory holding the file
+    default_name = os.path.basename(os.path.dirname(abs_path)) or "default"
+    project = spec.get("name") or re.sub(r"[^a-z0-9_-]", "", default_name.lower())
+    services = {}
+    for name, service in (spec.get("services") or {}).items():
+        service = service or {}
+        depends_on = service.get("depends_on") or []
+        services[name] = {
+            "image": service.get("image") or ("(build)" if service.get("build") else ""),
+            "replicas": (service.get("deploy") or {}).get("replicas", 1),
+            "ports": ", ".join(str(p) for p in service.get("ports") or []),
+            "depends_on": ", ".join(depends_on if isinstance(depends_on, list) else depends_on.keys()),
+            "healthcheck": bool(service.get("healthcheck")),
+        }
+    return {"path": abs_path, "project": project, "services": services}
+
+def compose_service_containers(state_cache: DockerStateCache, project: str) -> Dict[str, List[str]]:
+    """Map compose service names to container IDs using the compose labels in the state cache"""
+    mapping: Dict[str, List[str]] = {}
+    with state_cache.lock:
+        containers = list(state_cache.objects["container"].values())
+    for container in containers:
+        labels = container.get("Config", {}).get("Labels") or {}
+        if labels.get("com.docker.compose.project") == project:
+            mapping.setdefault(labels.get("com.docker.compose.service", ""), []).append(container["Id"])
+    return mapping
+
+def poll_compose_service(client: paramiko.SSHClient, container_ids: List[str]) -> List[dict]:
+    """Fetch state, health and restart count for one service's containers"""
+    if not container_ids:
+        return []
+    fmt = "{{.Name}}|{{.State.Status}}|{{if .State.Health}}{{.State.Health.Status}}{{end}}|{{.RestartCount}}"
+    output, error = run_ssh_command(
+        f"docker inspect --format '{fmt}' {' '.join(shlex.quote(c) for c in container_ids)}", client
+    )
+    results = []
+    for line in output.splitlines():
+        name, status, health, restarts = (line.split("|") + ["", "", "", "0"])[:4]
+        results.append({"name": name.lstrip("/"), "status": status, "health": health,
+                        "restarts": int(restarts or 0)})
+    return results
+
+def poll_compose_project(client: paramiko.SSHClient, state_cache: DockerStateCache, project: dict) -> List[dict]:
+    """Poll every service of a compose project concurrently and summarise each one"""
+    mapping = compose_service_containers(state_cache, project["project"])
+    service_names = list(project["services"])
+    with ThreadPoolExecutor(max_workers=min(16, max(1, len(service_names)))) as pool:
+        polled = list(pool.map(lambda name: poll_compose_service(client, mapping.get(name, [])), service_names))
+    rows = []
+    for name, containers in zip(service_names, polled):
+        service = project["services"][name]
+        health = sorted({c["health"] for c in containers if c["health"]})
+        rows.append({
+            "Service": name,
+            "Image": service["image"],
+            "Desired": service["replicas"],
+            "Running": sum(1 for c in containers if c["status"] == "running"),
+            "Health": ", ".join(health) or ("no healthcheck" if not service["healthcheck"] else "starting"),
+            "Restarts": sum(c["restarts"] for c in containers),
+            "Containers": ", ".join(c["name"] for c in containers),
+            "Ports": service["ports"],
+            "Depends On": service["depends_on"],
+        })
+    return rows
+
+def render_compose_project(client: paramiko.SSHClient, state_cache: DockerStateCache, compose_file: str):
+    """Structured compose project view with interval-cached health polling"""
+    if st.button("📂 Load Project") and compose_file:
+        try:
+            st.session_state.compose_project = load_compose_project(client, compose_file)
+            st.session_state.compose_status = None
+        except Exception as e:
+            st.error(f"Could not load compose file: {e}")
+    project = st.session_state.get("compose_project")
+    if not project:
+        return
+
+    st.markdown(f"**Project:** `{project['project']}` ({len(project['services'])} services) — `{project['path']}`")
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        interval = st.slider("Poll interval (seconds)", 5, 300, 15, key="compose_poll_interval")
+    with col2:
+        force = st.button("🔄 Poll Now")
+
+    cached = st.session_state.get("compose_status")
+    if force or cached is None or cached["project"] != project["project"] or time.time() - cached["at"] > interval:
+        cached = {"project": project["project"], "at": time.time(),
+                  "rows": poll_compose_project(client, state_cache, project)}
+        st.session_state.compose_status = cached
+
+    rows = cached["rows"]
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Services Up", f"{sum(1 for r in rows if r['Running'] >= r['Desired'])}/{len(rows)}")
+    with col2:
+        st.metric("Unhealthy", sum(1 for r in rows if "unhealthy" in r["Health"]))
+    with col3:
+        st.metric("Total Restarts", sum(r["Restarts"] for r in rows))
+    st.dataframe(rows, use_container_width=True)
+    st.caption(f"Polled {datetime.fromtimestamp(cached['at']).strftime('%H:%M:%S')}; "
+               f"next poll on the first rerun after {interval}s")
+
+SIZE_UNITS = {"B": 1, "KB": 1000, "MB": 1000 ** 2, "GB": 1000 ** 3, "TB": 1000 ** 4,
+              "KIB": 1024, "MIB": 1024 ** 2, "GIB": 1024 ** 3, "TIB": 1024 ** 4}
+
+def parse_size(value) -> int:
+    """Parse a docker CLI size string such as '1.2GB' or '512kB' into bytes"""
+    if isinstance(value, (int, float)):
+        return int(value)
+    match = re.match(r"^\s*([\d.]+)\s*([a-zA-Z]*)", str(value or ""))
+    if not match:
+        return 0
+    return int(float(match.group(1)) * SIZE_UNITS.get(match.group(2).upper() or "B", 1))
+
+def fetch_disk_usage(client: paramiko.SSHClient) -> Tuple[dict, str]:
+    """Structured ``docker system df -v`` plus image layer lists and free space on the docker root"""
+    output, error = run_ssh_command("docker system df -v --format '{{json .}}'", client)
+    try:
+        usage = json.loads(output)
+    except json.JSONDecodeError:
+        return {}, error or "Could not parse docker system df output"
+    image_ids = list(dict.fromkeys(img["ID"] for img in usage.get("Images") or []))
+    layers: Dict[str, List[str]] = {}
+    if image_ids:
+        output, _ = run_ssh_command(
+            "docker image inspect --format '{{.Id}} {{join .RootFS.Layers \",\"}}' "
+            + " ".join(shlex.quote(i) for i in image_ids), client
+        )
+        for line in output.splitlines():
+            image_id, _, layer_list = line.partition(" ")
+            layers[image_id] = [layer for layer in layer_list.split(",") if layer]
+    usage["Layers"] = layers
+    output, _ = run_ssh_command(
+        "df -B1 --output=avail \"$(docker info --format '{{.DockerRootDir}}')\" | tail -1", client
+    )
+    usage["FreeBytes"] = int(output.strip()) if output.strip().isdigit() else None
+    return usage, ''
+
+def image_layers(usage: dict, image_id: str) -> List[str]:
+    """Layer digests of an image, matching the (possibly truncated) ID from system df"""
+    for full_id, layer_list in usage["Layers"].items():
+        if full_id.replace("sha256:", "").startswith(image_id.replace("sha256:", "")):
+            return layer_list
+    return []
+
+def plan_image_reclaim(usage: dict, selected_ids: List[str]) -> Tuple[int, int]:
+    """Bytes freed by removing the selected images: (unique bytes, estimated shared bytes).
+
+    A shared layer is only freed when every image referencing it is removed.
+    ``system df`` reports shared bytes per image but not per layer, so each
+    image's SharedSize is spread evenly over its shared layers for the estimate.
+    """
+    images = {img["ID"]: img for img in usage.get("Images") or []}
+    layer_refs: Dict[str, set] = {}
+    for image_id in images:
+        for layer in image_layers(usage, image_id):
+            layer_refs.setdefault(layer, set()).add(image_id)
+
+    selected = set(selected_ids)
+    unique = sum(parse_size(images[i].get("UniqueSize")) for i in selected if i in images)
+    layer_bytes: Dict[str, List[float]] = {}
+    for image_id, image in images.items():
+        shared_layers = [l for l in image_layers(usage, image_id) if len(layer_refs[l]) > 1]
+        if shared_layers:
+            per_layer = parse_size(image.get("SharedSize")) / len(shared_layers)
+            for layer in shared_layers:
+                layer_bytes.setdefault(layer, []).append(per_layer)
+    shared = sum(
+        sum(sizes) / len(sizes) for layer, sizes in layer_bytes.items()
+        if layer_refs[layer] <= selected
+    )
+    return unique, int(shared)
+
+def image_references(usage: dict) -> Dict[str, dict]:
+    """Collapse ``system df`` image rows (one per repo:tag) into one entry per image ID with all its references"""
+    images: Dict[str, dict] = {}
+    for img in usage.get("Images") or []:
+        entry = images.setdefault(img["ID"], dict(img, References=[]))
+        if img.get("Repository") not in (None, "", "<none>") and img.get("Tag") not in (None, "", "<none>"):
+            entry["References"].append(f"{img['Repository']}:{img['Tag']}")
+    return images
+
+def image_remove_command(image: dict) -> str:
+    """``docker rmi`` by repo:tag so a multi-tag image is untagged everywhere, then deleted with its last tag"""
+    targets = image["References"] or [image["ID"]]
+    return "docker rmi " + " ".join(shlex.quote(t) for t in targets)
+
+def usage_totals(usage: dict) -> Dict[str, int]:
+    """Total bytes per category from structured system df data"""
+    images = list(image_references(usage).values())
+    return {
+        "Images": sum(parse_size(i.get("UniqueSize")) for i in images)
+                  + max([parse_size(i.get("SharedSize")) for i in images] or [0]),
+        "Volumes": sum(parse_size(v.get("Size")) for v in usage.get("Volumes") or []),
+        "Build Cache": sum(parse_size(b.get("Size")) for b in usage.get("BuildCache") or []
+                           if str(b.get("Shared")).lower() != "true"),
+    }
+
+def render_disk_reclaim_planner(client: paramiko.SSHClient):
+    """Choose images, volumes and build-cache entries to delete, then remove them in parallel"""
+    if st.button("🔍 Analyze Disk Usage"):
+        usage, error = fetch_disk_usage(client)
+        if error:
+            st.error(error)
+        else:
+            st.session_state.docker_disk_usage = usage
+    usage = st.session_state.get("docker_disk_usage")
+    if not usage:
+        return
+
+    image_refs = image_references(usage)
+    image_rows = [{
+        "Reclaim": False,
+        "ID": img["ID"],
+        "Image": ", ".join(img["References"]) or "<none>:<none>",
+        "Containers": int(img.get("Containers") or 0),
+        "Unique": format_bytes(parse_size(img.get("UniqueSize"))),
+        "Shared": format_bytes(parse_size(img.get("SharedSize"))),
+        "Created": img.get("CreatedSince", ""),
+    } for img in image_refs.values()]
+    volume_rows = [{
+        "Reclaim": False,
+        "Name": vol["Name"],
+        "Links": int(vol.get("Links") or 0),
+        "Size": format_bytes(parse_size(vol.get("Size"))),
+    } for vol in usage.get("Volumes") or []]
+    cache_rows = [{
+        "Reclaim": False,
+        "ID": entry["ID"],
+        "Type": entry.get("CacheType", ""),
+        "Description": entry.get("Description", ""),
+        "Size": format_bytes(parse_size(entry.get("Size"))),
+        "Shared": str(entry.get("Shared")).lower() == "true",
+        "In Use": str(entry.get("InUse")).lower() == "true",
+        "Last Used": entry.get("LastUsedSince", ""),
+    } for entry in usage.get("BuildCache") or []]
+
+    st.markdown("**Images** (images used by containers cannot be removed)")
+    image_sel = st.data_editor(image_rows, disabled=["ID", "Image", "Containers", "Unique", "Shared", "Created"],
+                               use_container_width=True, key="reclaim_images")
+    st.markdown("**Volumes** (only volumes with no linked containers can be removed)")
+    volume_sel = st.data_editor(volume_rows, disabled=["Name", "Links", "Size"],
+                                use_container_width=True, key="reclaim_volumes")
+    st.markdown("**Build Cache** (shared entries free no space on their own)")
+    cache_sel = st.data_editor(cache_rows, disabled=["ID", "Type", "Description", "Size", "Shared", "In Use", "Last Used"],
+                               use_container_width=True, key="reclaim_cache")
+
+    images = [r["ID"] for r in image_sel if r["Reclaim"] and r["Containers"] == 0]
+    volumes = [r["Name"] for r in volume_sel if r["Reclaim"] and r["Links"] == 0]
+    cache_entries = [r["ID"] for r in cache_sel if r["Reclaim"] and not r["In Use"]]
+    unique_bytes, shared_bytes = plan_image_reclaim(usage, images)
+    volume_bytes = sum(parse_size(v.get("Size")) for v in usage.get("Volumes") or [] if v["Name"] in volumes)
+    cache_bytes = sum(parse_size(b.get("Size")) for b in usage.get("BuildCache") or []
+                      if b["ID"] in cache_entries and str(b.get("Shared")).lower() != "true")
+
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Images (unique)", format_bytes(unique_bytes))
+    with col2:
+        st.metric("Shared layers (est.)", format_bytes(shared_bytes))
+    with col3:
+        st.metric("Volumes", format_bytes(volume_bytes))
+    with col4:
+        st.metric("Build Cache", format_bytes(cache_bytes))
+    st.info(f"Planned reclaim: {format_bytes(unique_bytes + shared_bytes + volume_bytes + cache_bytes)}")
+
+    if st.button("🧹 Reclaim Selected") and (images or volumes or cache_entries):
+        commands = [("Image", i, image_remove_command(image_refs[i])) for i in images]
+        commands += [("Volume", v, f"docker volume rm {shlex.quote(v)}") for v in volumes]
+        commands += [("Build Cache", c, f"docker builder prune -f --filter id={shlex.quote(c)}") for c in cache_entries]
+        with st.spinner(f"Running {len(commands)} deletions..."):
+            with ThreadPoolExecutor(max_workers=8) as pool:
+                results = list(pool.map(lambda cmd: run_ssh_command(cmd[2], client), commands))
+            after, error = fetch_disk_usage(client)
+        st.dataframe([{
+            "Type": kind, "Object": name, "Result": "removed" if not err.strip() else err.strip(),
+        } for (kind, name, _), (out, err) in zip(commands, results)], use_container_width=True)
+        if after:
+            before_totals, after_totals = usage_totals(usage), usage_totals(after)
+            report = [{
+                "Category": category,
+                "Before": format_bytes(before_totals[category]),
+                "After": format_bytes(after_totals[category]),
+                "Freed": format_bytes(before_totals[category] - after_totals[category]),
+            } for category in before_totals]
+            if usage.get("FreeBytes") is not None and after.get("FreeBytes") is not None:
+                report.append({
+                    "Category": "Filesystem free",
+                    "Before": format_bytes(usage["FreeBytes"]),
+                    "After": format_bytes(after["FreeBytes"]),
+                    "Freed": format_bytes(after["FreeBytes"] - usage["FreeBytes"]),
+                })
+            st.dataframe(report, use_container_width=True)
+            st.session_state.docker_disk_usage = after
+        log_command(f"Docker: Reclaimed {len(images)} images, {len(volumes)} volumes, {len(cache_entries)} cache entries")
+
 def devops_section(sub_choice=None):
     st.markdown('<h1 class="section-header">⚙️ DevOps Automation Platform</h1>', unsafe_allow_html=True)
     
@@ -79,18 +913,31 @@ def docker_section():
 
     st.success("SSH Connected! You can now automate Docker tasks.")
     client = st.session_state.docker_ssh_client
+    state_cache = get_docker_state_cache(client)
+
+    col1, col2 = st.columns([4, 1])
+    with col1:
+        if state_cache.error:
+            st.warning(f"Docker event stream interrupted, reconnecting: {state_cache.error}")
+        elif state_cache.ready.is_set():
+            last_event = state_cache.last_event.strftime('%H:%M:%S') if state_cache.last_event else "none yet"
+            st.caption(f"🟢 Live Docker state: {state_cache.event_count} events applied, last event {last_event}")
+    with col2:
+        if st.button("🔄 Resync State"):
+            try:
+                state_cache.snapshot()
+            except Exception as e:
+                st.error(f"Resync failed: {e}")
 
     tab_names = [
-        "📦 Images", "🚀 Containers", "🌐 Networks", "💾 Volumes", "🛠️ Compose", "📋 System", "🤖 Prompt"
+        "📦 Images", "🚀 Containers", "🌐 Networks", "💾 Volumes", "🛠️ Compose", "📋 System", "📜 Logs", "🤖 Prompt"
     ]
-    tab1, tab2, tab3, tab4, tab5, tab6, tab7 = st.tabs(tab_names)
+    tab1, tab2, tab3, tab4, tab5, tab6, tab_logs, tab7 = st.tabs(tab_names)
 
     # --- Images ---
     with tab1:
         st.subheader("📦 Docker Images")
-        if st.button("List Images"):
-            output, error = run_ssh_command("docker images", client)
-            st.code(output) if not error else st.error(error)
+        render_docker_state(state_cache, "image", "images")
         image_name = st.text_input("Image Name to Remove", key="img_rm")
         if st.button("Remove Image") and image_name:
             output, error = run_ssh_command(f"docker rmi {image_name}", client)
@@ -98,10 +945,41 @@ def docker_section():
         st.markdown("---")
         st.subheader("Build Image")
         build_name = st.text_input("Image Name (e.g. myapp:latest)", key="img_build")
-        dockerfile = st.text_input("Dockerfile Path", value="./Dockerfile", key="img_build_dockerfile")
-        if st.button("Build Image") and build_name and dockerfile:
-            output, error = run_ssh_command(f"docker build -t {build_name} {dockerfile}", client)
-            st.success(f"Built image {build_name}") if not error else st.error(error)
+        build_source = st.radio("Build Context", ["Remote path", "Local directory", "Upload"],
+                                horizontal=True, key="img_build_source")
+        build_context = None
+        if build_source == "Remote path":
+            build_context = st.text_input("Context Path on Host", value=".", key="img_build_context")
+        elif build_source == "Local directory":
+            build_context = st.text_input("Local Context Directory", value=".", key="img_build_local")
+        else:
+            build_context = st.file_uploader("Context (.tar, .tar.gz, .zip or individual files)",
+                                             accept_multiple_files=True, key="img_build_upload")
+        dockerfile = st.text_input("Dockerfile (relative to context)", value="Dockerfile", key="img_build_dockerfile")
+        if st.button("Build Image") and build_name and dockerfile and build_context:
+            if build_source == "Local directory" and not os.path.isdir(build_context):
+                st.error(f"Directory not found: {build_context}")
+            else:
+                if build_source == "Remote path":
+                    context_arg = shlex.quote(build_context)
+                    dockerfile_arg = shlex.quote(os.path.join(build_context, dockerfile))
+                else:
+                    context_arg, dockerfile_arg = "-", shlex.quote(dockerfile)
+                command = (f"DOCKER_BUILDKIT=1 docker build --progress=plain "
+                           f"-t {shlex.quote(build_name)} -f {dockerfile_arg} {context_arg}")
+                log_placeholder = st.empty()
+                started = time.time()
+                exit_code, build_log, tracker = stream_docker_build(
+                    client, command, build_source, build_context, log_placeholder
+                )
+                if exit_code == 0:
+                    st.success(f"Built image {build_name} in {time.time() - started:.1f}s")
+                    log_command(f"Docker: Built image {build_name} from {build_source.lower()} context")
+                else:
+                    st.error(f"Build failed (exit code {exit_code})")
+                render_build_report(tracker)
+                with st.expander("Full build log"):
+                    st.code("\n".join(build_log), language="bash")
         if st.button("Prune Unused Images"):
             output, error = run_ssh_command("docker image prune -f", client)
             st.success("Pruned unused images.") if not error else st.error(error)
@@ -109,9 +987,7 @@ def docker_section():
     # --- Containers ---
     with tab2:
         st.subheader("🚀 Docker Containers")
-        if st.button("List Containers"):
-            output, error = run_ssh_command("docker ps -a", client)
-            st.code(output) if not error else st.error(error)
+        render_docker_state(state_cache, "container", "containers")
         run_img = st.text_input("Image to Run", key="ctr_run_img")
         run_name = st.text_input("Container Name", key="ctr_run_name")
         run_ports = st.text_input("Port Mapping (host:container)", value="8080:80", key="ctr_run_ports")
@@ -143,9 +1019,7 @@ def docker_section():
     # --- Networks ---
     with tab3:
         st.subheader("🌐 Docker Networks")
-        if st.button("List Networks"):
-            output, error = run_ssh_command("docker network ls", client)
-            st.code(output) if not error else st.error(error)
+        render_docker_state(state_cache, "network", "networks")
         net_name = st.text_input("Network Name to Create", key="net_create")
         if st.button("Create Network") and net_name:
             output, error = run_ssh_command(f"docker network create {net_name}", client)
@@ -154,9 +1028,7 @@ def docker_section():
     # --- Volumes ---
     with tab4:
         st.subheader("💾 Docker Volumes")
-        if st.button("List Volumes"):
-            output, error = run_ssh_command("docker volume ls", client)
-            st.code(output) if not error else st.error(error)
+        render_docker_state(state_cache, "volume", "volumes")
         vol_name = st.text_input("Volume Name to Create", key="vol_create")
         if st.button("Create Volume") and vol_name:
             output, error = run_ssh_command(f"docker volume create {vol_name}", client)
@@ -175,6 +1047,9 @@ def docker_section():
         if st.button("List Compose Services") and compose_file:
             output, error = run_ssh_command(f"docker compose -f {compose_file} ps", client)
             st.code(output) if not error else st.error(error)
+        st.markdown("---")
+        st.subheader("📊 Project View")
+        render_compose_project(client, state_cache, compose_file)
 
     # --- System ---
     with tab6:
@@ -188,6 +1063,14 @@ def docker_section():
         if st.button("System Prune"):
             output, error = run_ssh_command("docker system prune -f", client)
             st.success("System pruned.") if not error else st.error(error)
+        st.markdown("---")
+        st.subheader("🧹 Disk Reclamation Planner")
+        render_disk_reclaim_planner(client)
+
+    # --- Logs ---
+    with tab_logs:
+        st.subheader("📜 Container Logs")
+        render_docker_logs_panel(client, state_cache)
 
     # --- Prompt-based ---
     with tab7:
@@ -196,11 +1079,12 @@ def docker_section():
         if st.button("🚀 Automate Docker Task") and prompt:
             import re
             command = None
+            cached_kind = None
             # Safe prompt-to-command mapping for Docker
             if re.search(r"list.*containers", prompt, re.I):
-                command = "docker ps -a"
+                cached_kind = "container"
             elif re.search(r"list.*images", prompt, re.I):
-                command = "docker images"
+                cached_kind = "image"
             elif re.search(r"remove.*image ([\w:.-]+)", prompt, re.I):
                 match = re.search(r"remove.*image ([\w:.-]+)", prompt, re.I)
                 if match:
@@ -245,14 +1129,14 @@ def docker_section():
                     if st.button("Run Container Now"):
                         command = f"docker run -d --name {container} -p {ports} {image}"
             elif re.search(r"list.*networks", prompt, re.I):
-                command = "docker network ls"
+                cached_kind = "network"
             elif re.search(r"create.*network ([\w-]+)", prompt, re.I):
                 match = re.search(r"create.*network ([\w-]+)", prompt, re.I)
                 if match:
                     network = match.group(1)
                     command = f"docker network create {network}"
             elif re.search(r"list.*volumes", prompt, re.I):
-                command = "docker volume ls"
+                cached_kind = "volume"
             elif re.search(r"create.*volume ([\w-]+)", prompt, re.I):
                 match = re.search(r"create.*volume ([\w-]+)", prompt, re.I)
                 if match:
@@ -262,9 +1146,16 @@ def docker_section():
                 command = "docker system info"
             elif re.search(r"system prune", prompt, re.I):
                 command = "docker system prune -f"
+            elif re.search(r"logs.*container ([\w-]+)", prompt, re.I):
+                match = re.search(r"logs.*container ([\w-]+)", prompt, re.I)
+                if match:
+                    container = match.group(1)
+                    command = f"docker logs --timestamps --tail 200 {container} 2>&1"
             else:
                 command = prompt  # fallback: treat as raw command
-            if command:
+            if cached_kind:
+                render_docker_state(state_cache, cached_kind, f"{cached_kind}s")
+            elif command:
                 output, error = run_ssh_command(command, client)
                 if error:
                     st.error(error)
@@ -273,10 +1164,756 @@ def docker_section():
             else:
                 st.warning("Could not interpret the prompt. Please try a different description.")
         if st.button("❌ Disconnect (Docker SSH)"):
+            state_cache.stop()
+            for follower in st.session_state.get("docker_log_followers", {}).values():
+                follower.stop()
+            st.session_state.docker_log_followers = {}
             st.session_state.docker_ssh_client.close()
             st.session_state.docker_ssh_connected = False
             st.success("🔌 Disconnected Successfully!")
 
+class JenkinsClient:
+    """Keep-alive HTTP client for one Jenkins controller and user.
+
+    Wraps a pooled ``requests.Session`` with retry/backoff on idempotent
+    requests, default timeouts, and a cached CSRF crumb that is attached to
+    every POST and refreshed once if Jenkins rejects it.
+    """
+
+    def __init__(self, url: str, username: str, api_token: str, timeout=(5, 30)):
+        self.url = url.rstrip("/")
+        self.username = username
+        self.api_token = api_token
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.auth = (username, api_token)
+        retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(429, 502, 503, 504),
+                      allowed_methods=frozenset(["GET", "HEAD"]))
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=16, max_retries=retry)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self._crumb = None
+        self._crumb_lock = threading.Lock()
+
+    def absolute(self, path: str) -> str:
+        """Accept both controller-relative paths and the absolute URLs Jenkins returns"""
+        return path if path.startswith(("http://", "https://")) else f"{self.url}{path}"
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.get(self.absolute(path), **kwargs)
+
+    def crumb(self, refresh: bool = False) -> dict:
+        """CSRF crumb header for POSTs; empty when the controller has CSRF protection disabled"""
+        with self._crumb_lock:
+            if self._crumb is None or refresh:
+                response = self.get("/crumbIssuer/api/json")
+                if response.status_code == 200:
+                    data = response.json()
+                    self._crumb = {data["crumbRequestField"]: data["crumb"]}
+                else:
+                    self._crumb = {}
+            return self._crumb
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        headers = kwargs.pop("headers", {})
+        response = self.session.post(self.absolute(path), headers={**headers, **self.crumb()}, **kwargs)
+        if response.status_code == 403 and self._crumb:
+            # Crumbs are bound to the web session; a restarted controller invalidates them
+            response = self.session.post(self.absolute(path), headers={**headers, **self.crumb(refresh=True)}, **kwargs)
+        return response
+
+_jenkins_clients: Dict[Tuple[str, str], JenkinsClient] = {}
+_jenkins_clients_lock = threading.Lock()
+
+def get_jenkins_client(url: str, username: str, api_token: str) -> JenkinsClient:
+    """Shared Jenkins client per (url, user), rebuilt when the token changes"""
+    key = (url.rstrip("/"), username)
+    with _jenkins_clients_lock:
+        client = _jenkins_clients.get(key)
+        if client is None or client.api_token != api_token:
+            if client is not None:
+                client.session.close()
+            client = JenkinsClient(url, username, api_token)
+            _jenkins_clients[key] = client
+        return client
+
+JENKINS_STATUS_COLORS = {
+    "Success": ["blue"],
+    "Failed": ["red"],
+    "Unstable": ["yellow"],
+    "Aborted": ["aborted"],
+    "Not Built": ["notbuilt"],
+    "Disabled": ["disabled"],
+}
+
+def jenkins_job_path(name: str) -> str:
+    """URL path of a job given as 'folder/sub/job'"""
+    return "".join(f"/job/{quote(part)}" for part in name.strip("/").split("/") if part)
+
+def jenkins_job_status(color: str) -> str:
+    """Human status from a Jenkins ball color ('_anime' marks a running build)"""
+    base = (color or "").replace("_anime", "")
+    status = next((label for label, colors in JENKINS_STATUS_COLORS.items() if base in colors), base or "Folder")
+    return f"{status} (building)" if (color or "").endswith("_anime") else status
+
+def fetch_jenkins_job_index(jenkins: JenkinsClient, folder: List[str]) -> List[dict]:
+    """Names, colors and classes of every job in one folder, a few dozen bytes per job"""
+    response = jenkins.get(f"{jenkins_job_path('/'.join(folder))}/api/json?tree=jobs[name,color,_class]")
+    response.raise_for_status()
+    return response.json().get("jobs", [])
+
+JENKINS_JOB_DETAIL_TREE = "name,url,color,_class,lastBuild[number,result,timestamp,duration]"
+
+def fetch_jenkins_job_page(jenkins: JenkinsClient, folder: List[str], index: List[dict],
+                           start: int, end: int, filtered: bool) -> List[dict]:
+    """Details for only the jobs on the visible page.
+
+    Unfiltered pages are one request using a tree range (``jobs[...]{start,end}``).
+    Filtered pages are not contiguous in the folder, so the page's jobs are
+    fetched individually over the pooled session.
+    """
+    folder_path = jenkins_job_path("/".join(folder))
+    if not filtered:
+        response = jenkins.get(f"{folder_path}/api/json?tree=jobs[{JENKINS_JOB_DETAIL_TREE}]{{{start},{end}}}")
+        response.raise_for_status()
+        return response.json().get("jobs", [])
+
+    def fetch_one(job):
+        response = jenkins.get(f"{folder_path}/job/{quote(job['name'])}/api/json?tree={JENKINS_JOB_DETAIL_TREE}")
+        return response.json() if response.status_code == 200 else job
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        return list(pool.map(fetch_one, index[start:end]))
+
+def render_jenkins_job_browser(jenkins: JenkinsClient):
+    """Folder-aware, paginated job browser that only creates widgets for the visible page"""
+    folder: List[str] = st.session_state.setdefault("jenkins_folder", [])
+    col1, col2, col3 = st.columns([3, 1, 1])
+    with col1:
+        st.markdown(f"**Folder:** `/{'/'.join(folder)}`")
+    with col2:
+        if st.button("⬆️ Up", disabled=not folder):
+            folder.pop()
+            st.session_state.jenkins_job_page = 0
+    with col3:
+        refresh = st.button("🔄 Refresh Jobs")
+
+    index_key = "/".join(folder)
+    indexes = st.session_state.setdefault("jenkins_job_index", {})
+    if refresh or index_key not in indexes:
+        try:
+            indexes[index_key] = fetch_jenkins_job_index(jenkins, folder)
+        except Exception as e:
+            st.error(f"Failed to fetch jobs: {e}")
+            return
+    index = indexes[index_key]
+
+    col1, col2, col3 = st.columns([2, 2, 1])
+    with col1:
+        name_filter = st.text_input("Filter by name", key="jenkins_job_filter")
+    with col2:
+        status_filter = st.multiselect("Filter by status", list(JENKINS_STATUS_COLORS) + ["Building", "Folder"],
+                                       key="jenkins_status_filter")
+    with col3:
+        page_size = st.selectbox("Page size", [25, 50, 100], index=1, key="jenkins_page_size")
+
+    jobs = index
+    if name_filter:
+        jobs = [j for j in jobs if name_filter.lower() in j["name"].lower()]
+    if status_filter:
+        jobs = [j for j in jobs if jenkins_job_status(j.get("color")).split(" (")[0] in status_filter
+                or ("Building" in status_filter and (j.get("color") or "").endswith("_anime"))]
+    filtered = bool(name_filter or status_filter)
+
+    pages = max(1, -(-len(jobs) // page_size))
+    page = min(st.session_state.get("jenkins_job_page", 0), pages - 1)
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if st.button("◀️ Prev", disabled=page == 0):
+            page -= 1
+    with col3:
+        if st.button("Next ▶️", disabled=page >= pages - 1):
+            page += 1
+    st.session_state.jenkins_job_page = page
+    with col2:
+        st.caption(f"Page {page + 1} of {pages} — {len(jobs)} of {len(index)} jobs")
+
+    start, end = page * page_size, min((page + 1) * page_size, len(jobs))
+    page_key = (index_key, filtered and tuple(j["name"] for j in jobs[start:end]), start, end)
+    cached_page = st.session_state.get("jenkins_page_cache")
+    if refresh or not cached_page or cached_page["key"] != page_key:
+        try:
+            cached_page = {"key": page_key,
+                           "jobs": fetch_jenkins_job_page(jenkins, folder, jobs, start, end, filtered)}
+        except Exception as e:
+            st.error(f"Failed to fetch job details: {e}")
+            return
+        st.session_state.jenkins_page_cache = cached_page
+    page_jobs = cached_page["jobs"]
+    if not page_jobs:
+        st.info("No jobs match.")
+        return
+
+    st.dataframe([{
+        "Job": job["name"],
+        "Status": jenkins_job_status(job.get("color")),
+        "Last Build": (job.get("lastBuild") or {}).get("number"),
+        "Result": (job.get("lastBuild") or {}).get("result"),
+        "Last Run": datetime.fromtimestamp(job["lastBuild"]["timestamp"] / 1000).strftime("%Y-%m-%d %H:%M")
+                    if job.get("lastBuild") else "",
+        "Duration (s)": round((job.get("lastBuild") or {}).get("duration", 0) / 1000, 1),
+    } for job in page_jobs], use_container_width=True)
+
+    # One set of action widgets for the selected job instead of two buttons per job
+    selected = st.selectbox("Job", [job["name"] for job in page_jobs], key="jenkins_selected_job")
+    job = next(j for j in page_jobs if j["name"] == selected)
+    col1, col2 = st.columns(2)
+    if "color" not in job or "Folder" in job.get("_class", "") or "MultiBranch" in job.get("_class", ""):
+        with col1:
+            if st.button(f"📂 Open {selected}"):
+                folder.append(selected)
+                st.session_state.jenkins_job_page = 0
+                st.rerun()
+        return
+    with col1:
+        if st.button(f"▶️ Build {selected}"):
+            try:
+                response = jenkins.post(f"{jenkins_job_path('/'.join(folder + [selected]))}/build")
+                if response.status_code in [200, 201]:
+                    st.success(f"Build triggered for {selected}!")
+                    log_command(f"Jenkins: Triggered build for {'/'.join(folder + [selected])}")
+                else:
+                    st.error(f"Failed to trigger build: {response.status_code}")
+            except Exception as e:
+                st.error(f"Error: {e}")
+    with col2:
+        st.write(f"Job URL: {job.get('url', '')}")
+
+class JenkinsConsoleStream:
+    """Incremental reader for one build's console via ``logText/progressiveText``.
+
+    Each poll sends the byte offset from the previous ``X-Text-Size`` header,
+    so only new output is transferred. Lines are kept in a bounded buffer and
+    polling ends once Jenkins stops sending ``X-More-Data``.
+    """
+
+    def __init__(self, job_name: str, build_number: int, max_lines: int):
+        self.job_name = job_name
+        self.build_number = build_number
+        self.offset = 0
+        self.lines: deque = deque(maxlen=max_lines)
+        self.partial = ''
+        self.more_data = True
+        self.bytes_received = 0
+        self.last_poll = 0.0
+
+    def poll(self, jenkins: JenkinsClient):
+        response = jenkins.get(
+            f"{jenkins_job_path(self.job_name)}/{self.build_number}/logText/progressiveText",
+            params={"start": self.offset},
+        )
+        self.last_poll = time.time()
+        response.raise_for_status()
+        self.offset = int(response.headers.get("X-Text-Size", self.offset))
+        self.more_data = response.headers.get("X-More-Data", "").lower() == "true"
+        self.bytes_received += len(response.content)
+        text = self.partial + response.text
+        *complete, self.partial = text.split("\n")
+        self.lines.extend(complete)
+        if not self.more_data and self.partial:
+            self.lines.append(self.partial)
+            self.partial = ''
+
+def render_jenkins_console(jenkins: JenkinsClient, job_name: str):
+    """Follow a build's console output, fetching only bytes not seen yet"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        build_ref = st.text_input("Build Number (blank for last build)", key="jenkins_console_build")
+    with col2:
+        max_lines = st.number_input("Buffer (lines)", min_value=100, max_value=100000, value=5000, key="jenkins_console_lines")
+    with col3:
+        poll_seconds = st.number_input("Poll every (s)", min_value=1, max_value=60, value=2, key="jenkins_console_poll")
+
+    if st.button("📜 Stream Console"):
+        try:
+            if build_ref.strip():
+                build_number = int(build_ref)
+            else:
+                response = jenkins.get(f"{jenkins_job_path(job_name)}/lastBuild/api/json?tree=number")
+                response.raise_for_status()
+                build_number = response.json()["number"]
+            st.session_state.jenkins_console = JenkinsConsoleStream(job_name, build_number, int(max_lines))
+        except Exception as e:
+            st.error(f"Could not resolve build: {e}")
+
+    stream: Optional[JenkinsConsoleStream] = st.session_state.get("jenkins_console")
+    if stream is None or stream.job_name != job_name:
+        return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        refresh = st.button("🔄 Refresh Console", disabled=not stream.more_data)
+    with col2:
+        if st.button("⏹️ Stop streaming"):
+            del st.session_state.jenkins_console
+            st.rerun()
+    # At most one poll per rerun, so the rest of the page keeps rendering during long builds
+    if stream.more_data and (refresh or time.time() - stream.last_poll >= poll_seconds):
+        try:
+            stream.poll(jenkins)
+        except Exception as e:
+            st.error(f"Console poll failed: {e}")
+    state = "running" if stream.more_data else "finished"
+    st.caption(f"Build #{stream.build_number} {state} — {stream.offset:,} bytes of log, "
+               f"{stream.bytes_received:,} transferred this session, showing last {len(stream.lines)} lines"
+               + (f"; next poll on the first rerun after {poll_seconds}s" if stream.more_data else ""))
+    st.code("\n".join(stream.lines), language="bash")
+
+JENKINS_QUEUE_TREE = "items[id,inQueueSince,stuck,blocked,buildable,task[name]]"
+JENKINS_COMPUTER_TREE = "busyExecutors,totalExecutors,computer[displayName,offline,numExecutors,idle]"
+
+class JenkinsMonitor:
+    """Background sampler of the build queue and executors on a fixed cadence.
+
+    Requests use minimal ``tree`` selectors and send ``If-None-Match`` /
+    ``If-Modified-Since`` when Jenkins provides validators. Bodies identical to
+    the previous poll are detected by hash and not parsed again.
+    """
+
+    def __init__(self, jenkins: JenkinsClient, interval: int, history: int):
+        self.jenkins = jenkins
+        self.interval = interval
+        self.samples: deque = deque(maxlen=history)
+        self.unchanged_polls = 0
+        self.error = ''
+        self._validators: Dict[str, dict] = {}
+        self._bodies: Dict[str, Tuple[str, dict]] = {}
+        self.stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _fetch(self, path: str) -> dict:
+        cached = self._bodies.get(path)
+        response = self.jenkins.get(path, headers=self._validators.get(path, {}))
+        if response.status_code == 304 and cached:
+            self.unchanged_polls += 1
+            return cached[1]
+        response.raise_for_status()
+        validators = {}
+        if response.headers.get("ETag"):
+            validators["If-None-Match"] = response.headers["ETag"]
+        if response.headers.get("Last-Modified"):
+            validators["If-Modified-Since"] = response.headers["Last-Modified"]
+        self._validators[path] = validators
+        digest = hashlib.sha1(response.content).hexdigest()
+        if cached and cached[0] == digest:
+            self.unchanged_polls += 1
+            return cached[1]
+        data = response.json()
+        self._bodies[path] = (digest, data)
+        return data
+
+    def sample(self):
+        queue = self._fetch(f"/queue/api/json?tree={JENKINS_QUEUE_TREE}")
+        computers = self._fetch(f"/computer/api/json?tree={JENKINS_COMPUTER_TREE}")
+        now = time.time()
+        waits = [now - item["inQueueSince"] / 1000 for item in queue.get("items", [])]
+        total = computers.get("totalExecutors", 0)
+        busy = computers.get("busyExecutors", 0)
+        self.samples.append({
+            "time": datetime.fromtimestamp(now),
+            "Queue Length": len(waits),
+            "Max Wait (s)": round(max(waits), 1) if waits else 0.0,
+            "Avg Wait (s)": round(sum(waits) / len(waits), 1) if waits else 0.0,
+            "Stuck": sum(1 for item in queue.get("items", []) if item.get("stuck")),
+            "Busy Executors": busy,
+            "Total Executors": total,
+            "Utilisation (%)": round(100 * busy / total, 1) if total else 0.0,
+            "Offline Nodes": sum(1 for c in computers.get("computer", []) if c.get("offline")),
+        })
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                self.sample()
+                self.error = ''
+            except Exception as e:
+                self.error = str(e)
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+
+def render_jenkins_monitor(jenkins: JenkinsClient):
+    """Queue length, wait time and executor utilisation charts from the background sampler"""
+    col1, col2 = st.columns(2)
+    with col1:
+        interval = st.number_input("Poll interval (s)", min_value=5, max_value=600, value=15, key="jenkins_monitor_interval")
+    with col2:
+        history = st.number_input("History (samples)", min_value=10, max_value=10000, value=240, key="jenkins_monitor_history")
+
+    monitor: Optional[JenkinsMonitor] = st.session_state.get("jenkins_monitor")
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("▶️ Start Monitor"):
+            if monitor is not None:
+                monitor.stop()
+            monitor = JenkinsMonitor(jenkins, int(interval), int(history))
+            st.session_state.jenkins_monitor = monitor
+    with col2:
+        if st.button("⏹️ Stop Monitor") and monitor is not None:
+            monitor.stop()
+
+    if monitor is None:
+        return
+    if monitor.jenkins is not jenkins:
+        # The client changed (new URL or token): the old sampler would keep polling forever
+        monitor.stop()
+        del st.session_state.jenkins_monitor
+        return
+    if monitor.error:
+        st.error(f"Monitor poll failed: {monitor.error}")
+    samples = list(monitor.samples)
+    if not samples:
+        st.info("Waiting for the first sample...")
+        return
+
+    latest = samples[-1]
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        st.metric("Queue Length", latest["Queue Length"])
+    with col2:
+        st.metric("Max Wait", f"{latest['Max Wait (s)']:.0f}s")
+    with col3:
+        st.metric("Executors Busy", f"{latest['Busy Executors']}/{latest['Total Executors']}")
+    with col4:
+        st.metric("Utilisation", f"{latest['Utilisation (%)']:.0f}%")
+
+    series = {key: [sample[key] for sample in samples] for key in latest}
+    st.line_chart(series, x="time", y=["Queue Length", "Stuck"])
+    st.line_chart(series, x="time", y=["Max Wait (s)", "Avg Wait (s)"])
+    st.line_chart(series, x="time", y=["Utilisation (%)"])
+    state = "running" if not monitor.stopped.is_set() else "stopped"
+    st.caption(f"Monitor {state}: {len(samples)} samples every {monitor.interval}s, "
+               f"{monitor.unchanged_polls} polls returned unchanged data")
+
+def parse_build_matrix(filename: str, content: str) -> List[dict]:
+    """Expand an uploaded batch spec into [{"job": ..., "params": {...}}, ...].
+
+    CSV: a ``job`` column plus one column per parameter (blank cells are dropped).
+    YAML: either a list of ``{job, params}`` entries, or a matrix
+    ``{jobs: [...], parameters: [{...}, ...]}`` that is expanded as a cross product.
+    """
+    if filename.endswith(".csv"):
+        return [
+            {"job": row.pop("job").strip(), "params": {k: v for k, v in row.items() if v not in (None, "")}}
+            for row in csv.DictReader(io.StringIO(content)) if row.get("job")
+        ]
+    spec = yaml.safe_load(content) or []
+    if isinstance(spec, dict):
+        parameter_sets = spec.get("parameters") or [{}]
+        return [{"job": job, "params": dict(params)}
+                for job, params in itertools.product(spec.get("jobs", []), parameter_sets)]
+    return [
+        {"job": entry["job"], "params": entry.get("params") or {k: v for k, v in entry.items() if k != "job"}}
+        for entry in spec
+    ]
+
+def run_batch_build(jenkins: JenkinsClient, row: dict, wait_for_result: bool, timeout: int = 3600):
+    """Trigger one build and follow it from the queue item (Location header) to its result"""
+    started = time.time()
+    job_path = jenkins_job_path(row["job"])
+    try:
+        if row["params"]:
+            response = jenkins.post(f"{job_path}/buildWithParameters", data=row["params"])
+        else:
+            response = jenkins.post(f"{job_path}/build")
+        if response.status_code not in (200, 201) or "Location" not in response.headers:
+            row["Status"] = f"trigger failed ({response.status_code})"
+            return
+        queue_url = response.headers["Location"].rstrip("/") + "/"
+        row["Status"] = "queued"
+        while time.time() - started < timeout:
+            item = jenkins.get(f"{queue_url}api/json?tree=cancelled,why,executable[number,url]").json()
+            if item.get("cancelled"):
+                row["Status"] = "cancelled in queue"
+                return
+            if item.get("executable"):
+                row["Build"] = item["executable"]["number"]
+                row["Queued (s)"] = round(time.time() - started, 1)
+                build_url = item["executable"]["url"]
+                break
+            time.sleep(2)
+        else:
+            row["Status"] = "timed out in queue"
+            return
+        row["Status"] = "running"
+        if not wait_for_result:
+            return
+        while time.time() - started < timeout:
+            build = jenkins.get(f"{build_url}api/json?tree=building,result,duration").json()
+            if not build.get("building"):
+                row["Status"] = build.get("result") or "UNKNOWN"
+                row["Duration (s)"] = round(build.get("duration", 0) / 1000, 1)
+                return
+            time.sleep(5)
+        row["Status"] = "timed out while running"
+    except Exception as e:
+        row["Status"] = f"error: {e}"
+
+class JenkinsBatch:
+    """A batch of builds launched from a background thread with a max-in-flight limit.
+
+    Worker threads update the shared ``rows`` in place; reruns render
+    snapshots of them, so widget interaction never waits on the batch.
+    """
+
+    def __init__(self, jenkins: JenkinsClient, batch: List[dict], max_in_flight: int, wait_for_result: bool):
+        self.jenkins = jenkins
+        self.max_in_flight = max_in_flight
+        self.wait_for_result = wait_for_result
+        self.rows = [{"Job": b["job"], "Parameters": json.dumps(b["params"]), "Status": "pending",
+                      "Build": None, "Queued (s)": None, "Duration (s)": None, "params": b["params"], "job": b["job"]}
+                     for b in batch]
+        self.started = time.time()
+        self.finished = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_in_flight) as pool:
+                for row in self.rows:
+                    pool.submit(run_batch_build, self.jenkins, row, self.wait_for_result)
+        finally:
+            self.finished.set()
+
+    def table(self) -> List[dict]:
+        return [{k: v for k, v in r.items() if k not in ("params", "job")} for r in list(self.rows)]
+
+    def status_counts(self) -> Dict[str, int]:
+        statuses: Dict[str, int] = {}
+        for row in self.table():
+            statuses[row["Status"]] = statuses.get(row["Status"], 0) + 1
+        return statuses
+
+def render_jenkins_batch_trigger(jenkins: JenkinsClient):
+    """Launch a matrix of parameterized builds with a max-in-flight limit"""
+    uploaded = st.file_uploader("Batch spec (CSV with a 'job' column, or YAML)", type=["csv", "yaml", "yml"],
+                                key="jenkins_batch_file")
+    col1, col2 = st.columns(2)
+    with col1:
+        max_in_flight = st.number_input("Max in flight", min_value=1, max_value=100, value=10, key="jenkins_batch_limit")
+    with col2:
+        wait_for_result = st.checkbox("Wait for build results", value=True, key="jenkins_batch_wait")
+    if uploaded is not None:
+        try:
+            batch = parse_build_matrix(uploaded.name, uploaded.getvalue().decode())
+        except Exception as e:
+            st.error(f"Could not parse batch spec: {e}")
+            batch = []
+        st.caption(f"{len(batch)} builds across {len({b['job'] for b in batch})} jobs")
+
+        if st.button("🚀 Launch Batch") and batch:
+            st.session_state.jenkins_batch = JenkinsBatch(jenkins, batch, int(max_in_flight), wait_for_result)
+            log_command(f"Jenkins: Batch triggered {len(batch)} builds (max {int(max_in_flight)} in flight)")
+
+    run: Optional[JenkinsBatch] = st.session_state.get("jenkins_batch")
+    if run is None:
+        return
+    summary = " · ".join(f"{status}: {count}" for status, count in sorted(run.status_counts().items()))
+    if run.finished.is_set():
+        st.success(f"Batch finished — {summary}")
+    else:
+        st.info(f"Batch running for {time.time() - run.started:.0f}s — {summary}")
+        st.button("🔄 Refresh Batch Status")
+    st.dataframe(run.table(), use_container_width=True)
+
+JENKINS_HISTORY_DB = "jenkins_history.db"
+
+def init_build_history_db(db_path: str = JENKINS_HISTORY_DB) -> sqlite3.Connection:
+    """Open the local build-history store, creating its tables on first use"""
+    conn = sqlite3.connect(db_path)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS builds (
+            controller TEXT, job TEXT, number INTEGER, result TEXT,
+            timestamp INTEGER, duration INTEGER,
+            PRIMARY KEY (controller, job, number)
+        )
+    """)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS sync_state (
+            controller TEXT, job TEXT, last_number INTEGER,
+            PRIMARY KEY (controller, job)
+        )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_builds_time ON builds (controller, timestamp)")
+    return conn
+
+def list_all_jenkins_jobs(jenkins: JenkinsClient) -> List[str]:
+    """Full names of every buildable job, walking folders breadth-first"""
+    jobs, pending = [], [[]]
+    while pending:
+        folder = pending.pop(0)
+        for job in fetch_jenkins_job_index(jenkins, folder):
+            if "color" in job:
+                jobs.append("/".join(folder + [job["name"]]))
+            else:
+                pending.append(folder + [job["name"]])
+    return jobs
+
+def fetch_new_builds(jenkins: JenkinsClient, job: str, last_number: int, since_ms: int,
+                     page_size: int = 100) -> Tuple[List[dict], int]:
+    """Completed builds newer than ``last_number`` and ``since_ms``, plus the new high-water mark.
+
+    Pages through ``allBuilds`` newest-first with tree ranges and stops at the
+    first already-synced (or too old) build. The mark never moves past a build
+    that is still running, so it is picked up by the next sync. A failed page
+    raises instead of returning a partial list, since the mark would otherwise
+    skip the older builds that were never fetched.
+    """
+    builds, start = [], 0
+    while True:
+        response = jenkins.get(f"{jenkins_job_path(job)}/api/json?"
+                               f"tree=allBuilds[number,result,timestamp,duration,building]{{{start},{start + page_size}}}")
+        response.raise_for_status()
+        page = response.json().get("allBuilds", [])
+        fresh = [b for b in page if b["number"] > last_number and b["timestamp"] >= since_ms]
+        builds.extend(fresh)
+        if len(fresh) < len(page) or len(page) < page_size:
+            break
+        start += page_size
+    running = [b["number"] for b in builds if b.get("building")]
+    completed = [b for b in builds if not b.get("building")]
+    if running:
+        high_water = min(running) - 1
+    else:
+        high_water = max([b["number"] for b in builds] + [last_number])
+    return [b for b in completed if b["number"] <= high_water], high_water
+
+def sync_build_history(jenkins: JenkinsClient, days: int, progress=None) -> Tuple[int, Dict[str, str]]:
+    """Incrementally pull builds newer than the last synced number for every job.
+
+    Returns the number of inserted builds and the jobs that failed to sync,
+    mapped to their error; a failed job keeps its previous sync state.
+    """
+    conn = init_build_history_db()
+    try:
+        synced = dict(conn.execute("SELECT job, last_number FROM sync_state WHERE controller = ?",
+                                   (jenkins.url,)).fetchall())
+        jobs = list_all_jenkins_jobs(jenkins)
+        since_ms = int((time.time() - days * 86400) * 1000)
+        inserted, failed = 0, {}
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            futures = {job: pool.submit(fetch_new_builds, jenkins, job, synced.get(job, 0), since_ms) for job in jobs}
+            for i, (job, future) in enumerate(futures.items()):
+                if progress is not None:
+                    progress.progress((i + 1) / len(jobs), text=f"Synced {job}")
+                try:
+                    builds, high_water = future.result()
+                except Exception as e:
+                    failed[job] = str(e)
+                    continue
+                conn.executemany(
+                    "INSERT OR REPLACE INTO builds VALUES (?, ?, ?, ?, ?, ?)",
+                    [(jenkins.url, job, b["number"], b.get("result"), b["timestamp"], b.get("duration", 0))
+                     for b in builds],
+                )
+                conn.execute("INSERT OR REPLACE INTO sync_state VALUES (?, ?, ?)", (jenkins.url, job, high_water))
+                inserted += len(builds)
+        conn.commit()
+        return inserted, failed
+    finally:
+        conn.close()
+
+def load_build_history(controller: str, days: int) -> pd.DataFrame:
+    """Builds from the local store for one controller within the last ``days``"""
+    conn = init_build_history_db()
+    try:
+        df = pd.read_sql_query(
+            "SELECT job, number, result, timestamp, duration FROM builds WHERE controller = ? AND timestamp >= ?",
+            conn, params=(controller, int((time.time() - days * 86400) * 1000)),
+        )
+    finally:
+        conn.close()
+    df["started"] = pd.to_datetime(df["timestamp"], unit="ms")
+    df["duration_s"] = df["duration"] / 1000
+    df["failed"] = df["result"].isin(["FAILURE", "UNSTABLE"])
+    return df
+
+def duration_percentiles(df: pd.DataFrame) -> pd.DataFrame:
+    """p50/p90/p99 build duration per job"""
+    stats = df.groupby("job")["duration_s"].quantile([0.5, 0.9, 0.99]).unstack()
+    stats.columns = ["p50 (s)", "p90 (s)", "p99 (s)"]
+    stats["builds"] = df.groupby("job").size()
+    return stats.sort_values("p90 (s)", ascending=False)
+
+def failure_rate_trend(df: pd.DataFrame, window_days: int = 7) -> pd.DataFrame:
+    """Daily failure rate across all jobs with a rolling mean"""
+    daily = df.set_index("started")["failed"].resample("D").agg(["mean", "count"])
+    daily.columns = ["failure rate", "builds"]
+    daily[f"{window_days}d rolling"] = daily["failure rate"].rolling(window_days, min_periods=1).mean()
+    return daily
+
+def detect_flaky_jobs(df: pd.DataFrame, min_builds: int = 10, min_flip_rate: float = 0.2) -> pd.DataFrame:
+    """Jobs whose result keeps flipping between pass and fail from one build to the next"""
+    ordered = df[df["result"].isin(["SUCCESS", "FAILURE", "UNSTABLE"])].sort_values(["job", "number"])
+    previous = ordered.groupby("job")["failed"].shift()
+    ordered = ordered.assign(flip=previous.notna() & (ordered["failed"] != previous))
+    stats = ordered.groupby("job").agg(builds=("number", "size"), failures=("failed", "sum"), flips=("flip", "sum"))
+    stats["failure rate"] = stats["failures"] / stats["builds"]
+    stats["flip rate"] = stats["flips"] / (stats["builds"] - 1).clip(lower=1)
+    flaky = stats[(stats["builds"] >= min_builds) & (stats["flip rate"] >= min_flip_rate)]
+    return flaky.sort_values("flip rate", ascending=False)
+
+def render_jenkins_analytics(jenkins: JenkinsClient):
+    """Sync the local build-history store and show duration, failure and flakiness analytics"""
+    col1, col2 = st.columns(2)
+    with col1:
+        days = st.number_input("Window (days)", min_value=1, max_value=365, value=90, key="jenkins_history_days")
+    with col2:
+        min_builds = st.number_input("Min builds for flaky detection", min_value=3, max_value=500, value=10,
+                                     key="jenkins_flaky_min")
+    if st.button("🔄 Sync Build History"):
+        progress = st.progress(0.0, text="Listing jobs...")
+        try:
+            inserted, failed = sync_build_history(jenkins, int(days), progress)
+            st.success(f"Synced {inserted} new builds into {JENKINS_HISTORY_DB}")
+            log_command(f"Jenkins: Synced {inserted} builds from {jenkins.url}")
+            if failed:
+                st.warning(f"{len(failed)} job(s) failed to sync and will be retried on the next sync")
+                with st.expander("Failed jobs"):
+                    st.dataframe(pd.DataFrame({"Job": list(failed), "Error": list(failed.values())}),
+                                 use_container_width=True)
+        except Exception as e:
+            st.error(f"Sync failed: {e}")
+
+    df = load_build_history(jenkins.url, int(days))
+    if df.empty:
+        st.info("No builds stored yet. Sync the build history first.")
+        return
+
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric("Builds", len(df))
+    with col2:
+        st.metric("Jobs", df["job"].nunique())
+    with col3:
+        st.metric("Failure Rate", f"{df['failed'].mean():.1%}")
+
+    st.subheader("⏱️ Duration Percentiles")
+    st.dataframe(duration_percentiles(df).round(1), use_container_width=True)
+    st.subheader("📉 Failure Rate Trend")
+    st.line_chart(failure_rate_trend(df)[["failure rate", "7d rolling"]])
+    st.subheader("🎲 Flaky Jobs")
+    flaky = detect_flaky_jobs(df, min_builds=int(min_builds))
+    if flaky.empty:
+        st.success("No flaky jobs detected.")
+    else:
+        st.dataframe(flaky.round(3), use_container_width=True)
+
 def jenkins_section():
     st.subheader("⚙️ Jenkins Automation")
     
@@ -289,9 +1926,7 @@ def jenkins_section():
     if st.button("🔗 Test Connection"):
         if jenkins_url and username and api_token:
             try:
-                response = requests.get(f"{jenkins_url}/api/json", 
-                                      auth=(username, api_token), 
-                                      timeout=10)
+                response = get_jenkins_client(jenkins_url, username, api_token).get("/api/json?tree=mode")
                 if response.status_code == 200:
                     st.success("✅ Jenkins connection successful!")
                     st.session_state.jenkins_config = {
@@ -309,65 +1944,26 @@ def jenkins_section():
     # Jenkins operations
     if 'jenkins_config' in st.session_state:
         config = st.session_state.jenkins_config
+        jenkins = get_jenkins_client(config['url'], config['username'], config['api_token'])
         
-        tab1, tab2, tab3 = st.tabs(["📋 Jobs", "🚀 Builds", "📊 Dashboard"])
+        tab1, tab2, tab3, tab4 = st.tabs(["📋 Jobs", "🚀 Builds", "📊 Dashboard", "📈 Analytics"])
         
         with tab1:
             st.subheader("📋 Jenkins Jobs")
             
-            if st.button("🔄 Refresh Jobs"):
-                try:
-                    response = requests.get(f"{config['url']}/api/json?tree=jobs[name,url,color,builds[number,result,timestamp]]", 
-                                          auth=(config['username'], config['api_token']))
-                    if response.status_code == 200:
-                        jobs_data = response.json()
-                        st.session_state.jenkins_jobs = jobs_data['jobs']
-                        st.success("Jobs refreshed!")
-                    else:
-                        st.error("Failed to fetch jobs")
-                except Exception as e:
-                    st.error(f"Error: {e}")
-            
-            if 'jenkins_jobs' in st.session_state:
-                jobs = st.session_state.jenkins_jobs
-                
-                for job in jobs:
-                    with st.expander(f"📋 {job['name']} - {job.get('color', 'N/A')}"):
-                        col1, col2 = st.columns(2)
-                        
-                        with col1:
-                            if st.button(f"▶️ Build {job['name']}", key=f"build_{job['name']}"):
-                                try:
-                                    response = requests.post(f"{job['url']}build", 
-                                                          auth=(config['username'], config['api_token']))
-                                    if response.status_code in [200, 201]:
-                                        st.success(f"Build triggered for {job['name']}!")
-                                        log_command(f"Jenkins: Triggered build for {job['name']}")
-                                    else:
-                                        st.error(f"Failed to trigger build: {response.status_code}")
-                                except Exception as e:
-                                    st.error(f"Error: {e}")
-                        
-                        with col2:
-                            if st.button(f"📊 View {job['name']}", key=f"view_{job['name']}"):
-                                st.write(f"Job URL: {job['url']}")
-                                if 'builds' in job and job['builds']:
-                                    st.write("Recent builds:")
-                                    for build in job['builds'][:5]:
-                                        st.write(f"- Build #{build['number']}: {build.get('result', 'N/A')}")
+            render_jenkins_job_browser(jenkins)
         
         with tab2:
             st.subheader("🚀 Build Management")
             
-            job_name = st.text_input("Job Name for Build Operations:")
+            job_name = st.text_input("Job Name for Build Operations (use folder/job for folders):")
             if job_name:
                 col1, col2, col3 = st.columns(3)
                 
                 with col1:
                     if st.button("▶️ Trigger Build"):
                         try:
-                            response = requests.post(f"{config['url']}/job/{job_name}/build", 
-                                                  auth=(config['username'], config['api_token']))
+                            response = jenkins.post(f"{jenkins_job_path(job_name)}/build")
                             if response.status_code in [200, 201]:
                                 st.success(f"Build triggered for {job_name}!")
                                 log_command(f"Jenkins: Triggered build for {job_name}")
@@ -379,8 +1975,7 @@ def jenkins_section():
                 with col2:
                     if st.button("⏸️ Stop Build"):
                         try:
-                            response = requests.post(f"{config['url']}/job/{job_name}/lastBuild/stop", 
-                                                  auth=(config['username'], config['api_token']))
+                            response = jenkins.post(f"{jenkins_job_path(job_name)}/lastBuild/stop")
                             if response.status_code == 200:
                                 st.success(f"Build stopped for {job_name}!")
                             else:
@@ -391,8 +1986,7 @@ def jenkins_section():
                 with col3:
                     if st.button("📋 Build History"):
                         try:
-                            response = requests.get(f"{config['url']}/job/{job_name}/api/json?tree=builds[number,result,timestamp,duration]", 
-                                                  auth=(config['username'], config['api_token']))
+                            response = jenkins.get(f"{jenkins_job_path(job_name)}/api/json?tree=builds[number,result,timestamp,duration]{{0,10}}")
                             if response.status_code == 200:
                                 build_data = response.json()
                                 if 'builds' in build_data:
@@ -403,14 +1997,19 @@ def jenkins_section():
                                 st.error(f"Failed to fetch build history: {response.status_code}")
                         except Exception as e:
                             st.error(f"Error: {e}")
+                
+                st.subheader("📜 Console Output")
+                render_jenkins_console(jenkins, job_name)
+            
+            st.subheader("📦 Batch Trigger")
+            render_jenkins_batch_trigger(jenkins)
         
         with tab3:
             st.subheader("📊 Jenkins Dashboard")
             
             if st.button("📊 Get System Info"):
                 try:
-                    response = requests.get(f"{config['url']}/api/json", 
-                                          auth=(config['username'], config['api_token']))
+                    response = jenkins.get("/api/json")
                     if response.status_code == 200:
                         system_info = response.json()
                         
@@ -424,23 +2023,864 @@ def jenkins_section():
                         with col4:
                             st.metric("Queue Length", system_info.get('queueLength', 'N/A'))
                         
-                        st.json(system_info)
+                        with st.expander("Raw system info"):
+                            st.json(system_info)
                     else:
                         st.error(f"Failed to fetch system info: {response.status_code}")
                 except Exception as e:
                     st.error(f"Error: {e}")
+            
+            st.subheader("📈 Queue & Executor Monitor")
+            render_jenkins_monitor(jenkins)
+        
+        with tab4:
+            st.subheader("📈 Build History Analytics")
+            render_jenkins_analytics(jenkins)
+
+class KubeInformer:
+    """List+watch cache for one cluster-wide resource type.
+
+    Lists once, then watches from the list's resourceVersion and applies
+    ADDED/MODIFIED/DELETED events to an in-memory store. Dropped watches
+    resume from the last seen resourceVersion; an expired one (410 Gone)
+    triggers a fresh list.
+    """
+
+    def __init__(self, name: str, list_func):
+        self.name = name
+        self.list_func = list_func
+        self.items: Dict[str, object] = {}
+        self.resource_version = None
+        self.lock = threading.Lock()
+        self.ready = threading.Event()
+        self.stopped = threading.Event()
+        self.error = ''
+        self._watch = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def key(obj) -> str:
+        return f"{obj.metadata.namespace or ''}/{obj.metadata.name}"
+
+    def relist(self):
+        result = self.list_func()
+        with self.lock:
+            self.items = {self.key(obj): obj for obj in result.items}
+            self.resource_version = result.metadata.resource_version
+        self.ready.set()
+
+    def _run(self):
+        backoff = 1
+        while not self.stopped.is_set():
+            try:
+                if self.resource_version is None:
+                    self.relist()
+                self._watch = k8s_watch.Watch()
+                for event in self._watch.stream(self.list_func, resource_version=self.resource_version,
+                                                timeout_seconds=300, allow_watch_bookmarks=True):
+                    obj = event["object"]
+                    if event["type"] == "BOOKMARK":
+                        self.resource_version = event["raw_object"]["metadata"]["resourceVersion"]
+                        continue
+                    with self.lock:
+                        if event["type"] == "DELETED":
+                            self.items.pop(self.key(obj), None)
+                        else:
+                            self.items[self.key(obj)] = obj
+                        self.resource_version = obj.metadata.resource_version
+                self.error = ''
+                backoff = 1
+            except ApiException as e:
+                if e.status == 410:
+                    self.resource_version = None
+                    continue
+                self.error = f"{e.status}: {e.reason}"
+            except Exception as e:
+                self.error = str(e)
+            if self.error and not self.stopped.is_set():
+                self.stopped.wait(backoff)
+                backoff = min(backoff * 2, 60)
+
+    def list(self, namespace: str = "") -> List[object]:
+        with self.lock:
+            objs = list(self.items.values())
+        if namespace:
+            objs = [obj for obj in objs if obj.metadata.namespace == namespace]
+        return sorted(objs, key=lambda obj: (obj.metadata.namespace or "", obj.metadata.name))
+
+    def stop(self):
+        self.stopped.set()
+        if self._watch is not None:
+            self._watch.stop()
+
+class KubeCluster:
+    """API clients and warm informer caches for one kubeconfig context"""
+
+    def __init__(self, context: Optional[str] = None):
+        self.context = context
+        self.api_client = k8s_config.new_client_from_config(context=context)
+        self.core = k8s_client.CoreV1Api(self.api_client)
+        self.apps = k8s_client.AppsV1Api(self.api_client)
+        self.informers = {
+            "pods": KubeInformer("pods", self.core.list_pod_for_all_namespaces),
+            "deployments": KubeInformer("deployments", self.apps.list_deployment_for_all_namespaces),
+            "services": KubeInformer("services", self.core.list_service_for_all_namespaces),
+            "nodes": KubeInformer("nodes", self.core.list_node),
+            "namespaces": KubeInformer("namespaces", self.core.list_namespace),
+        }
+        self._dynamic = None
+        self._dynamic_lock = threading.Lock()
+        self.metrics_sampler = None
+
+    def dynamic(self) -> k8s_dynamic.DynamicClient:
+        """Dynamic client for arbitrary kinds; API discovery runs once per cluster"""
+        with self._dynamic_lock:
+            if self._dynamic is None:
+                self._dynamic = k8s_dynamic.DynamicClient(self.api_client)
+            return self._dynamic
+
+    def stop(self):
+        for informer in self.informers.values():
+            informer.stop()
+
+_kube_clusters: Dict[Optional[str], KubeCluster] = {}
+_kube_clusters_lock = threading.Lock()
+# Contexts that could not be constructed or reached: context -> (time, error)
+_kube_failures: Dict[Optional[str], Tuple[float, str]] = {}
+KUBE_FAILURE_TTL = 120
+KUBE_REQUEST_TIMEOUT = 10
+
+def get_kube_cluster(context: Optional[str] = None) -> KubeCluster:
+    """Shared cluster client per kubeconfig context; informers stay warm across reruns"""
+    with _kube_clusters_lock:
+        if context not in _kube_clusters:
+            try:
+                _kube_clusters[context] = KubeCluster(context)
+            except Exception as e:
+                _kube_failures[context] = (time.time(), str(e))
+                raise
+            _kube_failures.pop(context, None)
+        return _kube_clusters[context]
+
+def kube_cluster_failure(context: Optional[str]) -> Optional[str]:
+    """Recent construction or reachability error of a context, if it is still within the retry delay"""
+    failure = _kube_failures.get(context)
+    if failure and time.time() - failure[0] < KUBE_FAILURE_TTL:
+        return f"{failure[1]} (retry in {KUBE_FAILURE_TTL - (time.time() - failure[0]):.0f}s)"
+    return None
+
+def mark_kube_cluster_unreachable(context: Optional[str], error: str):
+    """Stop a context's informers so they do not retry in the background, and remember the failure"""
+    with _kube_clusters_lock:
+        cluster = _kube_clusters.pop(context, None)
+        _kube_failures[context] = (time.time(), error)
+    if cluster is not None:
+        cluster.stop()
+
+def kube_age(timestamp) -> str:
+    """kubectl-style age of a creation timestamp"""
+    if timestamp is None:
+        return ""
+    seconds = int((datetime.now(timezone.utc) - timestamp).total_seconds())
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if seconds >= size:
+            return f"{seconds // size}{unit}"
+    return f"{seconds}s"
+
+def kube_rows(kind: str, objs: List[object]) -> List[dict]:
+    """Table rows resembling ``kubectl get -o wide`` for cached objects"""
+    if kind == "pods":
+        rows = []
+        for pod in objs:
+            statuses = pod.status.container_statuses or []
+            rows.append({
+                "Namespace": pod.metadata.namespace, "Name": pod.metadata.name,
+                "Ready": f"{sum(1 for c in statuses if c.ready)}/{len(pod.spec.containers)}",
+                "Status": pod.status.phase, "Restarts": sum(c.restart_count for c in statuses),
+                "Node": pod.spec.node_name, "IP": pod.status.pod_ip, "Age": kube_age(pod.metadata.creation_timestamp),
+            })
+        return rows
+    if kind == "deployments":
+        return [{
+            "Namespace": d.metadata.namespace, "Name": d.metadata.name,
+            "Ready": f"{d.status.ready_replicas or 0}/{d.spec.replicas}",
+            "Up-to-date": d.status.updated_replicas or 0, "Available": d.status.available_replicas or 0,
+            "Images": ", ".join(c.image for c in d.spec.template.spec.containers),
+            "Age": kube_age(d.metadata.creation_timestamp),
+        } for d in objs]
+    if kind == "services":
+        return [{
+            "Namespace": svc.metadata.namespace, "Name": svc.metadata.name, "Type": svc.spec.type,
+            "Cluster IP": svc.spec.cluster_ip,
+            "Ports": ", ".join(f"{p.port}/{p.protocol}" for p in svc.spec.ports or []),
+            "Age": kube_age(svc.metadata.creation_timestamp),
+        } for svc in objs]
+    if kind == "nodes":
+        return [{
+            "Name": node.metadata.name,
+            "Status": next((("Ready" if c.status == "True" else "NotReady")
+                            for c in node.status.conditions or [] if c.type == "Ready"), "Unknown"),
+            "Roles": ", ".join(label.split("/", 1)[1] for label in node.metadata.labels or {}
+                               if label.startswith("node-role.kubernetes.io/")) or "<none>",
+            "Version": node.status.node_info.kubelet_version,
+            "Internal IP": next((a.address for a in node.status.addresses or [] if a.type == "InternalIP"), ""),
+            "Age": kube_age(node.metadata.creation_timestamp),
+        } for node in objs]
+    if kind == "namespaces":
+        return [{"Name": ns.metadata.name, "Status": ns.status.phase,
+                 "Age": kube_age(ns.metadata.creation_timestamp)} for ns in objs]
+    return [{"Namespace": obj.metadata.namespace, "Name": obj.metadata.name,
+             "Keys": len(obj.data or {}), "Age": kube_age(obj.metadata.creation_timestamp)} for obj in objs]
+
+def list_kube_resources(cluster: KubeCluster, kind: str, namespace: str = "") -> List[dict]:
+    """Rows for a resource type, from the informer cache where one exists.
+
+    ``namespace`` may be a comma-separated list; empty means all namespaces.
+    """
+    namespaces = [ns.strip() for ns in namespace.split(",") if ns.strip()] or [""]
+    if kind in cluster.informers:
+        return [row for ns in namespaces for row in kube_rows(kind, cluster.informers[kind].list(ns))]
+    # ConfigMaps and secrets are not watched (secrets would keep every value in memory)
+    rows = []
+    for ns in namespaces:
+        timeout = {"_request_timeout": KUBE_REQUEST_TIMEOUT}
+        if kind == "configmaps":
+            result = (cluster.core.list_namespaced_config_map(ns, **timeout) if ns
+                      else cluster.core.list_config_map_for_all_namespaces(**timeout))
+        else:
+            result = (cluster.core.list_namespaced_secret(ns, **timeout) if ns
+                      else cluster.core.list_secret_for_all_namespaces(**timeout))
+        rows.extend(kube_rows(kind, result.items))
+    return rows
+
+def kube_contexts() -> Tuple[List[str], Optional[str]]:
+    """Context names from kubeconfig and the current one"""
+    contexts, active = k8s_config.list_kube_config_contexts()
+    return [c["name"] for c in contexts], (active or {}).get("name")
+
+def list_kube_resources_multi(contexts: List[str], kind: str,
+                              namespace: str = "") -> Tuple[List[dict], Dict[str, str], List[str]]:
+    """Run the same resource query against several contexts concurrently, tagging rows with a cluster column.
+
+    Never waits for a cache: contexts whose informer has not finished its
+    first list are returned as loading. A context whose first list failed is
+    treated as unreachable: its informers are stopped and it is skipped until
+    ``KUBE_FAILURE_TTL`` has passed. Returns (rows, errors, loading contexts).
+    """
+    def query(context):
+        failure = kube_cluster_failure(context)
+        if failure:
+            raise ConnectionError(failure)
+        cluster = get_kube_cluster(context)
+        informer = cluster.informers.get(kind)
+        if informer is not None and not informer.ready.is_set():
+            if informer.error:
+                mark_kube_cluster_unreachable(context, informer.error)
+                raise ConnectionError(informer.error)
+            return None
+        try:
+            return [{"Cluster": context, **row} for row in list_kube_resources(cluster, kind, namespace)]
+        except Exception as e:
+            if not isinstance(e, ApiException):
+                mark_kube_cluster_unreachable(context, str(e))
+            raise
+
+    rows, errors, loading = [], {}, []
+    with ThreadPoolExecutor(max_workers=min(16, max(1, len(contexts)))) as pool:
+        futures = {context: pool.submit(query, context) for context in contexts}
+        for context, future in futures.items():
+            try:
+                result = future.result()
+            except ApiException as e:
+                errors[context] = f"{e.status} {e.reason}"
+                continue
+            except Exception as e:
+                errors[context] = str(e)
+                continue
+            if result is None:
+                loading.append(context)
+            else:
+                rows.extend(result)
+    return rows, errors, loading
+
+def render_kube_resources_multi(contexts: List[str], kind: str, namespace: str = ""):
+    """Render one resource type merged across clusters"""
+    rows, errors, loading = list_kube_resources_multi(contexts, kind, namespace)
+    for context, error in errors.items():
+        st.warning(f"{context}: {error}")
+    if loading:
+        st.info(f"Loading {kind} from: {', '.join(loading)}")
+    if rows:
+        st.dataframe(rows, use_container_width=True)
+    elif not loading:
+        st.info(f"No {kind} found.")
+
+def render_kube_resources(cluster: KubeCluster, kind: str, namespace: str = ""):
+    """Render a resource table from the cluster cache"""
+    informer = cluster.informers.get(kind)
+    if informer is not None and not informer.ready.is_set():
+        st.info(f"Loading {kind}...")
+        return
+    if informer is not None and informer.error:
+        st.warning(f"Watch for {kind} interrupted, resuming: {informer.error}")
+    try:
+        rows = list_kube_resources(cluster, kind, namespace)
+    except ApiException as e:
+        st.error(f"Error: {e.status} {e.reason}")
+        return
+    if rows:
+        st.dataframe(rows, use_container_width=True)
+    else:
+        st.info(f"No {kind} found.")
+
+APPLY_FIELD_MANAGER = "automation-platform"
+
+# Objects in an earlier tier must exist before later tiers can be admitted
+APPLY_TIERS = [
+    {"Namespace", "CustomResourceDefinition"},
+    {"ServiceAccount", "ConfigMap", "Secret", "PersistentVolume", "PersistentVolumeClaim", "StorageClass",
+     "ClusterRole", "Role", "PriorityClass", "LimitRange", "ResourceQuota"},
+    {"ClusterRoleBinding", "RoleBinding"},
+]
+
+# Server-populated fields that would make every diff noisy
+VOLATILE_METADATA = ("managedFields", "resourceVersion", "generation", "uid", "creationTimestamp", "selfLink")
+
+def parse_manifests(content: str) -> List[dict]:
+    """Split multi-document YAML into objects, expanding ``kind: List``"""
+    objects = []
+    for doc in yaml.safe_load_all(content):
+        if not doc:
+            continue
+        if doc.get("kind") == "List":
+            objects.extend(item for item in doc.get("items", []) if item)
+        else:
+            objects.append(doc)
+    return objects
+
+def apply_tiers(objects: List[dict]) -> List[List[dict]]:
+    """Group objects into dependency tiers; objects within a tier are independent"""
+    tiers: List[List[dict]] = [[] for _ in range(len(APPLY_TIERS) + 1)]
+    for obj in objects:
+        index = next((i for i, kinds in enumerate(APPLY_TIERS) if obj.get("kind") in kinds), len(APPLY_TIERS))
+        tiers[index].append(obj)
+    return [tier for tier in tiers if tier]
+
+def comparable_manifest(obj: Optional[dict]) -> str:
+    """YAML dump of an object without status and server-managed metadata"""
+    if not obj:
+        return ""
+    obj = {k: v for k, v in obj.items() if k != "status"}
+    obj["metadata"] = {k: v for k, v in obj.get("metadata", {}).items() if k not in VOLATILE_METADATA}
+    annotations = obj["metadata"].get("annotations") or {}
+    annotations.pop("deployment.kubernetes.io/revision", None)
+    annotations.pop("kubectl.kubernetes.io/last-applied-configuration", None)
+    if not annotations:
+        obj["metadata"].pop("annotations", None)
+    return yaml.safe_dump(obj, sort_keys=True)
+
+def manifest_provides(objects: List[dict]) -> Tuple[set, set]:
+    """Namespaces and (group, kind) pairs that applying these objects would create"""
+    namespaces = {obj.get("metadata", {}).get("name") for obj in objects if obj.get("kind") == "Namespace"}
+    kinds = {
+        (obj.get("spec", {}).get("group", ""), obj.get("spec", {}).get("names", {}).get("kind"))
+        for obj in objects if obj.get("kind") == "CustomResourceDefinition"
+    }
+    return namespaces, kinds
+
+def server_side_apply_object(cluster: KubeCluster, obj: dict, default_namespace: str,
+                             dry_run: bool, force: bool, provided: Tuple[set, set] = (set(), set())) -> dict:
+    """Server-side apply one object and report what changed compared to the live version.
+
+    In a dry run nothing from earlier tiers exists yet, so a missing namespace
+    or kind that ``provided`` says the same manifest creates is reported as
+    depending on the preview rather than as an error.
+    """
+    dyn = cluster.dynamic()
+    name = obj.get("metadata", {}).get("name", "")
+    group = obj.get("apiVersion", "").rpartition("/")[0]
+    result = {"Kind": obj.get("kind"), "Namespace": "", "Name": name, "Result": "", "diff": ""}
+    try:
+        resource = dyn.resources.get(api_version=obj["apiVersion"], kind=obj["kind"])
+        namespace = (obj.get("metadata", {}).get("namespace") or default_namespace) if resource.namespaced else None
+        result["Namespace"] = namespace or ""
+        try:
+            live = dyn.get(resource, name=name, namespace=namespace).to_dict()
+        except k8s_dynamic.exceptions.NotFoundError:
+            live = None
+        applied = dyn.server_side_apply(
+            resource, body=obj, name=name, namespace=namespace, field_manager=APPLY_FIELD_MANAGER,
+            force_conflicts=force, dry_run="All" if dry_run else None,
+        ).to_dict()
+        before, after = comparable_manifest(live), comparable_manifest(applied)
+        result["diff"] = "".join(difflib.unified_diff(
+            before.splitlines(True), after.splitlines(True), "live", "applied"
+        ))
+        if live is None:
+            result["Result"] = "created"
+        else:
+            result["Result"] = "configured" if result["diff"] else "unchanged"
+        if dry_run:
+            result["Result"] += " (dry run)"
+    except k8s_dynamic.exceptions.ResourceNotFoundError:
+        if dry_run and (group, obj.get("kind")) in provided[1]:
+            result["Result"] = "created (dry run, kind defined by a CRD in this manifest)"
+        else:
+            result["Result"] = f"error: unknown kind {obj.get('apiVersion')}/{obj.get('kind')}"
+    except ApiException as e:
+        if dry_run and e.status == 404 and result["Namespace"] and result["Namespace"] in provided[0]:
+            result["Result"] = "created (dry run, namespace created by this manifest)"
+        else:
+            result["Result"] = f"error: {e.status} {e.reason}"
+    except Exception as e:
+        result["Result"] = f"error: {e}"
+    return result
+
+def apply_manifests(cluster: KubeCluster, objects: List[dict], default_namespace: str,
+                    dry_run: bool, force: bool) -> List[dict]:
+    """Apply tier by tier, with the objects of each tier applied concurrently"""
+    results = []
+    provided = manifest_provides(objects) if dry_run else (set(), set())
+    for tier in apply_tiers(objects):
+        with ThreadPoolExecutor(max_workers=min(16, len(tier))) as pool:
+            results.extend(pool.map(
+                lambda obj: server_side_apply_object(cluster, obj, default_namespace, dry_run, force, provided), tier
+            ))
+        if not dry_run and any(obj.get("kind") == "CustomResourceDefinition" for obj in tier):
+            # Newly registered kinds are only visible after rediscovery
+            cluster.dynamic().resources.invalidate_cache()
+    return results
+
+def render_apply_results(results: List[dict]):
+    """Per-object apply results with an expandable diff for changed objects"""
+    st.dataframe([{k: v for k, v in r.items() if k != "diff"} for r in results], use_container_width=True)
+    for r in results:
+        if r["diff"]:
+            with st.expander(f"Diff: {r['Kind']} {r['Namespace']}/{r['Name']}".replace(" /", " ")):
+                st.code(r["diff"], language="diff")
+
+class KubeLogFollower:
+    """Stream one container's log into a bounded buffer, keeping only lines matching a regex"""
+
+    def __init__(self, cluster: KubeCluster, namespace: str, pod: str, container: str,
+                 since_seconds: int, follow: bool, pattern: str, max_lines: int):
+        self.source = f"{pod}/{container}"
+        self.buffer: deque = deque(maxlen=max_lines)
+        self.running = True
+        self.error = ''
+        self._regex = re.compile(pattern) if pattern else None
+        self._stopped = threading.Event()
+        self._response = None
+        self._kwargs = dict(name=pod, namespace=namespace, container=container, timestamps=True,
+                            since_seconds=since_seconds or None, follow=follow)
+        self._core = cluster.core
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        # Read the raw response directly: Watch.stream would force follow=True
+        try:
+            self._response = self._core.read_namespaced_pod_log(_preload_content=False, **self._kwargs)
+            if self._stopped.is_set():
+                return
+            for raw in self._response:
+                ts, _, text = raw.decode("utf-8", errors="replace").rstrip("\n").partition(" ")
+                if self._regex is None or self._regex.search(text):
+                    self.buffer.append((ts, text))
+        except Exception as e:
+            if not self._stopped.is_set():
+                self.error = str(e)
+        finally:
+            if self._response is not None:
+                self._response.release_conn()
+            self.running = False
+
+    def stop(self):
+        """Close the response so a followed stream ends now, not when the next line arrives"""
+        self._stopped.set()
+        if self._response is not None:
+            self._response.close()
+
+def render_kube_logs_panel(cluster: KubeCluster):
+    """Follow logs of one pod or every pod matching a label selector, merged by timestamp"""
+    followers: Dict[str, KubeLogFollower] = st.session_state.setdefault("kube_log_followers", {})
+    col1, col2 = st.columns(2)
+    with col1:
+        log_namespace = st.text_input("Namespace", value="default", key="kube_logs_namespace")
+    with col2:
+        target = st.text_input("Pod name, or label selector (e.g. app=web)", key="kube_logs_target")
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        since_seconds = st.number_input("Since (seconds)", min_value=0, max_value=7 * 86400, value=600, key="kube_logs_since")
+    with col2:
+        pattern = st.text_input("Regex Filter", key="kube_logs_pattern")
+    with col3:
+        max_lines = st.number_input("Buffer per container", min_value=100, max_value=50000, value=2000, key="kube_logs_buffer")
+    with col4:
+        follow = st.checkbox("Follow", value=True, key="kube_logs_follow")
+
+    if pattern:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            st.error(f"Invalid regex: {e}")
+            return
+
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("▶️ Stream Logs") and target:
+            for follower in followers.values():
+                follower.stop()
+            followers.clear()
+            try:
+                if "=" in target:
+                    pods = cluster.core.list_namespaced_pod(log_namespace, label_selector=target).items
+                else:
+                    pods = [cluster.core.read_namespaced_pod(target, log_namespace)]
+            except ApiException as e:
+                st.error(f"Error: {e.status} {e.reason}")
+                pods = []
+            for pod in pods:
+                for container in pod.spec.containers:
+                    follower = KubeLogFollower(cluster, log_namespace, pod.metadata.name, container.name,
+                                               int(since_seconds), follow, pattern, int(max_lines))
+                    followers[follower.source] = follower
+            if pods:
+                log_command(f"Kubernetes: Streaming logs for {len(followers)} containers ({target})")
+    with col2:
+        if st.button("⏹️ Stop Streams"):
+            for follower in followers.values():
+                follower.stop()
+            followers.clear()
+
+    if not followers:
+        return
+    active = sum(1 for f in followers.values() if f.running)
+    st.caption(f"{len(followers)} containers, {active} streaming")
+    for source, follower in followers.items():
+        if follower.error:
+            st.warning(f"{source}: {follower.error}")
+
+    view_lines = st.slider("Lines to show", 50, 5000, 500, 50, key="kube_logs_view")
+    # One snapshot per rerun, so Resource Usage below never waits on the log view
+    st.button("🔄 Refresh Logs", key="kube_logs_refresh")
+    merged = merge_log_buffers({source: f.buffer for source, f in followers.items()}, view_lines)
+    st.code("\n".join(f"[{source}] {ts} {line}" for ts, source, line in merged) or "(no lines yet)")
+
+class KubeMetricsSampler:
+    """Poll metrics.k8s.io for the whole cluster on an interval into per-object ring buffers.
+
+    Each interval costs exactly two requests (all pods, all nodes), however
+    many objects there are. Samples are (time, CPU millicores, memory MiB).
+    """
+
+    def __init__(self, cluster: KubeCluster, interval: int, history: int):
+        self.cluster = cluster
+        self.interval = interval
+        self.history = history
+        self.custom = k8s_client.CustomObjectsApi(cluster.api_client)
+        self.pods: Dict[str, deque] = {}
+        self.nodes: Dict[str, deque] = {}
+        self.lock = threading.Lock()
+        self.error = ''
+        self.stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def snapshot(self) -> Tuple[Dict[str, list], Dict[str, list]]:
+        """Copies of the pod and node series that are safe to read while sampling continues"""
+        with self.lock:
+            return ({k: list(v) for k, v in self.pods.items()}, {k: list(v) for k, v in self.nodes.items()})
+
+    def _record(self, series: Dict[str, deque], key: str, sample: tuple):
+        if key not in series:
+            series[key] = deque(maxlen=self.history)
+        series[key].append(sample)
+
+    def sample(self):
+        now = datetime.now()
+        pods = self.custom.list_cluster_custom_object("metrics.k8s.io", "v1beta1", "pods")
+        nodes = self.custom.list_cluster_custom_object("metrics.k8s.io", "v1beta1", "nodes")
+        with self.lock:
+            self._store(now, pods, nodes)
+
+    def _store(self, now: datetime, pods: dict, nodes: dict):
+        for item in pods.get("items", []):
+            containers = item.get("containers", [])
+            cpu = sum(float(parse_quantity(c["usage"]["cpu"])) for c in containers) * 1000
+            memory = sum(float(parse_quantity(c["usage"]["memory"])) for c in containers) / 2 ** 20
+            self._record(self.pods, f"{item['metadata']['namespace']}/{item['metadata']['name']}", (now, cpu, memory))
+        for item in nodes.get("items", []):
+            cpu = float(parse_quantity(item["usage"]["cpu"])) * 1000
+            memory = float(parse_quantity(item["usage"]["memory"])) / 2 ** 20
+            self._record(self.nodes, item["metadata"]["name"], (now, cpu, memory))
+        # Forget objects that have not reported for a full history window
+        cutoff = self.history * self.interval
+        for series in (self.pods, self.nodes):
+            for key in [k for k, v in series.items() if (now - v[-1][0]).total_seconds() > cutoff]:
+                del series[key]
+
+    def _run(self):
+        while not self.stopped.is_set():
+            try:
+                self.sample()
+                self.error = ''
+            except ApiException as e:
+                self.error = f"{e.status} {e.reason} (is metrics-server installed?)"
+            except Exception as e:
+                self.error = str(e)
+            self.stopped.wait(self.interval)
+
+    def stop(self):
+        self.stopped.set()
+
+def pod_resource_specs(cluster: KubeCluster) -> Dict[str, dict]:
+    """Summed CPU (millicores) and memory (MiB) requests/limits per pod from the informer cache"""
+    specs = {}
+    for pod in cluster.informers["pods"].list():
+        totals = {"cpu_request": 0.0, "cpu_limit": 0.0, "mem_request": 0.0, "mem_limit": 0.0}
+        for container in pod.spec.containers:
+            resources = container.resources
+            for field, values in (("request", resources.requests or {}), ("limit", resources.limits or {})):
+                if "cpu" in values:
+                    totals[f"cpu_{field}"] += float(parse_quantity(values["cpu"])) * 1000
+                if "memory" in values:
+                    totals[f"mem_{field}"] += float(parse_quantity(values["memory"])) / 2 ** 20
+        specs[f"{pod.metadata.namespace}/{pod.metadata.name}"] = totals
+    return specs
+
+def provisioning_report(pod_series: Dict[str, list], specs: Dict[str, dict],
+                        low: float = 0.3, high: float = 0.9) -> pd.DataFrame:
+    """Compare p95 usage over the sampled window against requests and limits per pod"""
+    rows = []
+    for key, samples in pod_series.items():
+        if key not in specs:
+            continue
+        usage = pd.DataFrame(samples, columns=["time", "cpu", "mem"])
+        spec = specs[key]
+        cpu_p95, mem_p95 = usage["cpu"].quantile(0.95), usage["mem"].quantile(0.95)
+        findings = []
+        for label, p95, request, limit in (("CPU", cpu_p95, spec["cpu_request"], spec["cpu_limit"]),
+                                           ("Memory", mem_p95, spec["mem_request"], spec["mem_limit"])):
+            if not request:
+                findings.append(f"{label}: no request")
+            elif p95 < low * request:
+                findings.append(f"{label}: over-provisioned")
+            elif p95 > request or (limit and p95 > high * limit):
+                findings.append(f"{label}: under-provisioned")
+        rows.append({
+            "Pod": key, "CPU p95 (m)": round(cpu_p95, 1), "CPU Request (m)": spec["cpu_request"],
+            "CPU Limit (m)": spec["cpu_limit"], "Mem p95 (MiB)": round(mem_p95, 1),
+            "Mem Request (MiB)": round(spec["mem_request"], 1), "Mem Limit (MiB)": round(spec["mem_limit"], 1),
+            "Assessment": ", ".join(findings) or "ok",
+        })
+    return pd.DataFrame(rows)
+
+def usage_frame(series: Dict[str, list], keys: List[str], column: int) -> pd.DataFrame:
+    """Time-indexed frame of one metric (1 = CPU, 2 = memory) for the chosen objects"""
+    return pd.DataFrame({
+        key: pd.Series([s[column] for s in series[key]], index=[s[0] for s in series[key]])
+        for key in keys if key in series
+    })
+
+def render_kube_metrics(cluster: KubeCluster):
+    """Charts and provisioning analysis from the cluster metrics sampler"""
+    col1, col2 = st.columns(2)
+    with col1:
+        interval = st.number_input("Sample every (s)", min_value=5, max_value=600, value=15, key="kube_metrics_interval")
+    with col2:
+        history = st.number_input("Samples kept per object", min_value=10, max_value=5000, value=240, key="kube_metrics_history")
+
+    sampler: Optional[KubeMetricsSampler] = cluster.metrics_sampler
+    col1, col2 = st.columns(2)
+    with col1:
+        if st.button("▶️ Start Sampling"):
+            if sampler is not None:
+                sampler.stop()
+            sampler = cluster.metrics_sampler = KubeMetricsSampler(cluster, int(interval), int(history))
+    with col2:
+        if st.button("⏹️ Stop Sampling") and sampler is not None:
+            sampler.stop()
+    if sampler is None:
+        return
+    if sampler.error:
+        st.error(f"Metrics API error: {sampler.error}")
+    pods, nodes = sampler.snapshot()
+    if not nodes and not pods:
+        st.info("Waiting for the first sample...")
+        return
+
+    node_keys = sorted(nodes)
+    st.markdown("**Nodes**")
+    st.dataframe([{"Node": key, "CPU (m)": round(nodes[key][-1][1]),
+                   "Memory (MiB)": round(nodes[key][-1][2])} for key in node_keys],
+                 use_container_width=True)
+    col1, col2 = st.columns(2)
+    with col1:
+        st.caption("CPU (millicores)")
+        st.line_chart(usage_frame(nodes, node_keys, 1))
+    with col2:
+        st.caption("Memory (MiB)")
+        st.line_chart(usage_frame(nodes, node_keys, 2))
+
+    st.markdown("**Pods**")
+    busiest = sorted(pods, key=lambda k: -pods[k][-1][1])
+    chosen = st.multiselect("Pods to chart", busiest, default=busiest[:5], key="kube_metrics_pods")
+    if chosen:
+        col1, col2 = st.columns(2)
+        with col1:
+            st.caption("CPU (millicores)")
+            st.line_chart(usage_frame(pods, chosen, 1))
+        with col2:
+            st.caption("Memory (MiB)")
+            st.line_chart(usage_frame(pods, chosen, 2))
+
+    st.markdown("**Requests & Limits vs Usage**")
+    report = provisioning_report(pods, pod_resource_specs(cluster))
+    if not report.empty:
+        flagged_only = st.checkbox("Show only flagged pods", value=True, key="kube_metrics_flagged")
+        if flagged_only:
+            report = report[report["Assessment"] != "ok"]
+        st.dataframe(report, use_container_width=True)
+
+PREVIOUS_REPLICAS_ANNOTATION = "automation-platform/previous-replicas"
+
+def bulk_deployment_patch(cluster: KubeCluster, deployment, operation: str, value) -> Tuple[str, Optional[int]]:
+    """Patch one deployment for a bulk operation; returns (result, generation to wait for)"""
+    name, namespace = deployment.metadata.name, deployment.metadata.namespace
+    annotations = deployment.metadata.annotations or {}
+    if operation == "Scale":
+        body = {"spec": {"replicas": int(value)}}
+        # Keep the count from before the first scale, so repeated scales still restore to it
+        if PREVIOUS_REPLICAS_ANNOTATION not in annotations:
+            body["metadata"] = {"annotations": {PREVIOUS_REPLICAS_ANNOTATION: str(deployment.spec.replicas)}}
+    elif operation == "Restore previous replicas":
+        if PREVIOUS_REPLICAS_ANNOTATION not in annotations:
+            return "skipped: no previous replica count recorded", None
+        body = {"metadata": {"annotations": {PREVIOUS_REPLICAS_ANNOTATION: None}},
+                "spec": {"replicas": int(annotations[PREVIOUS_REPLICAS_ANNOTATION])}}
+    elif operation == "Restart":
+        # Same annotation `kubectl rollout restart` sets
+        restarted_at = datetime.now(timezone.utc).isoformat()
+        body = {"spec": {"template": {"metadata": {"annotations": {"kubectl.kubernetes.io/restartedAt": restarted_at}}}}}
+    else:
+        container, image = value
+        containers = [c.name for c in deployment.spec.template.spec.containers]
+        if container not in containers:
+            return f"skipped: no container '{container}'", None
+        body = {"spec": {"template": {"spec": {"containers": [{"name": container, "image": image}]}}}}
+    try:
+        patched = cluster.apps.patch_namespaced_deployment(name, namespace, body)
+        return "patched", patched.metadata.generation
+    except ApiException as e:
+        return f"error: {e.status} {e.reason}", None
+
+def rollout_status(deployment, generation: Optional[int]) -> dict:
+    """Rollout progress of a deployment, judged like `kubectl rollout status`"""
+    spec, status = deployment.spec, deployment.status
+    desired = spec.replicas or 0
+    observed = (status.observed_generation or 0) >= (generation or deployment.metadata.generation or 0)
+    updated, ready, available = status.updated_replicas or 0, status.ready_replicas or 0, status.available_replicas or 0
+    total = status.replicas or 0
+    done = observed and updated == desired and total == desired and available == desired
+    stalled = any(c.type == "Progressing" and c.reason == "ProgressDeadlineExceeded" for c in status.conditions or [])
+    return {
+        "Deployment": f"{deployment.metadata.namespace}/{deployment.metadata.name}",
+        "Desired": desired, "Updated": updated, "Ready": ready, "Available": available,
+        "Rollout": "complete" if done else ("stalled" if stalled else "progressing"),
+    }
+
+def render_bulk_deployment_ops(cluster: KubeCluster):
+    """Selector-based bulk scale/restart/image update with rollout progress from the deployment watch"""
+    col1, col2 = st.columns(2)
+    with col1:
+        bulk_namespace = st.text_input("Namespace:", value="default", key="bulk_namespace")
+    with col2:
+        selector = st.text_input("Label selector (empty for all deployments):", key="bulk_selector")
+    operation = st.selectbox("Operation:", ["Scale", "Restore previous replicas", "Restart", "Update image"],
+                             key="bulk_operation")
+    value = None
+    if operation == "Scale":
+        value = st.number_input("Replicas:", min_value=0, max_value=1000, value=1, key="bulk_replicas")
+    elif operation == "Update image":
+        col1, col2 = st.columns(2)
+        with col1:
+            container = st.text_input("Container name:", key="bulk_container")
+        with col2:
+            image = st.text_input("New image:", key="bulk_image")
+        value = (container, image)
+
+    if st.button("⚡ Apply to Matching Deployments"):
+        if operation == "Update image" and not all(value):
+            st.warning("Please provide container name and image")
+            return
+        try:
+            targets = cluster.apps.list_namespaced_deployment(bulk_namespace, label_selector=selector or None).items
+        except ApiException as e:
+            st.error(f"Error: {e.status} {e.reason}")
+            return
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(lambda d: bulk_deployment_patch(cluster, d, operation, value), targets))
+        st.session_state.bulk_rollout = {
+            f"{d.metadata.namespace}/{d.metadata.name}": {"result": result, "generation": generation}
+            for d, (result, generation) in zip(targets, results)
+        }
+        st.success(f"{operation}: {sum(1 for r, _ in results if r == 'patched')} of {len(targets)} deployments patched")
+        log_command(f"Kubernetes: Bulk {operation.lower()} on {len(targets)} deployments in {bulk_namespace} ({selector or 'all'})")
+
+    tracked = st.session_state.get("bulk_rollout")
+    if not tracked:
+        return
+    # One snapshot from the deployment informer per rerun; nothing here waits for the rollout
+    informer = cluster.informers["deployments"]
+    with informer.lock:
+        current = {key: informer.items.get(key) for key in tracked}
+    rows = []
+    for key, info in tracked.items():
+        deployment = current[key]
+        if deployment is None:
+            rows.append({"Deployment": key, "Rollout": "deleted", "Patch": info["result"]})
+        else:
+            rows.append({**rollout_status(deployment, info["generation"]), "Patch": info["result"]})
+    st.dataframe(rows, use_container_width=True)
+    progressing = sum(1 for r in rows if r["Rollout"] == "progressing")
+    col1, col2 = st.columns(2)
+    with col1:
+        st.button("🔄 Refresh Rollout", disabled=not progressing)
+    with col2:
+        if st.button("🧹 Clear Tracking"):
+            del st.session_state.bulk_rollout
+            st.rerun()
+    st.caption(f"{progressing} of {len(rows)} rollouts still progressing" if progressing else "All tracked rollouts settled")
 
 def kubernetes_section():
     st.subheader("☸️ Kubernetes Management")
     
-    # Check if kubectl is available
-    success, output, error = run_command("kubectl version --client")
-    if not success:
-        st.error("❌ kubectl not found. Please install kubectl to use Kubernetes features.")
-        st.info("Install kubectl from: https://kubernetes.io/docs/tasks/tools/install-kubectl/")
+    # One client per kubeconfig context, kept warm across reruns
+    try:
+        contexts, active_context = kube_contexts()
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            context = st.selectbox("Context:", contexts, index=contexts.index(active_context) if active_context in contexts else 0)
+        with col2:
+            all_clusters = st.checkbox("🌐 All clusters", help="Query every context in parallel for resource views")
+        cluster = get_kube_cluster(context)
+    except Exception as e:
+        st.error(f"❌ Could not load kubeconfig: {e}")
+        st.info("Configure cluster access in ~/.kube/config (see https://kubernetes.io/docs/concepts/configuration/organize-cluster-access-kubeconfig/)")
         return
     
-    st.success("✅ kubectl found!")
+    if all_clusters:
+        st.success(f"✅ Viewing {len(contexts)} clusters; actions apply to {context}")
+    else:
+        st.success(f"✅ Connected to {context} ({cluster.api_client.configuration.host})")
+    
+    def render_resources(kind, namespace=""):
+        if all_clusters:
+            render_kube_resources_multi(contexts, kind, namespace)
+        else:
+            render_kube_resources(cluster, kind, namespace)
     
     # Create tabs for different K8s operations
     tab1, tab2, tab3, tab4, tab5 = st.tabs([
@@ -454,20 +2894,9 @@ def kubernetes_section():
             "pods", "deployments", "services", "configmaps", "secrets", "nodes", "namespaces"
         ])
         
-        namespace = st.text_input("Namespace (leave empty for all):", value="default")
+        namespace = st.text_input("Namespace (comma-separated, leave empty for all):", value="default")
         
-        if st.button(f"📋 List {resource_type}"):
-            cmd = f"kubectl get {resource_type}"
-            if namespace:
-                cmd += f" -n {namespace}"
-            cmd += " -o wide"
-            
-            success, output, error = run_command(cmd)
-            if success:
-                st.code(output)
-                log_command(f"Kubernetes: Listed {resource_type}")
-            else:
-                st.error(f"Error: {error}")
+        render_resources(resource_type, namespace if resource_type not in ("nodes", "namespaces") else "")
     
     with tab2:
         st.subheader("🚀 Deployment Management")
@@ -476,77 +2905,96 @@ def kubernetes_section():
         
         with col1:
             st.subheader("📋 Deployments")
-            if st.button("📋 List Deployments"):
-                success, output, error = run_command("kubectl get deployments -o wide")
-                if success:
-                    st.code(output)
-                else:
-                    st.error(f"Error: {error}")
+            render_resources("deployments", namespace)
         
         with col2:
             st.subheader("🔧 Scale Deployment")
             deployment_name = st.text_input("Deployment Name:")
-            replicas = st.number_input("Number of Replicas:", min_value=0, max_value=10, value=1)
+            deployment_namespace = st.text_input("Deployment Namespace:", value="default")
+            replicas = st.number_input("Number of Replicas:", min_value=0, max_value=1000, value=1)
             
             if st.button("⚖️ Scale"):
                 if deployment_name:
-                    success, output, error = run_command(f"kubectl scale deployment {deployment_name} --replicas={replicas}")
-                    if success:
+                    try:
+                        cluster.apps.patch_namespaced_deployment_scale(
+                            deployment_name, deployment_namespace, {"spec": {"replicas": int(replicas)}}
+                        )
                         st.success(f"Scaled {deployment_name} to {replicas} replicas!")
                         log_command(f"Kubernetes: Scaled deployment {deployment_name} to {replicas} replicas")
-                    else:
-                        st.error(f"Error: {error}")
+                    except ApiException as e:
+                        st.error(f"Error: {e.status} {e.reason}")
                 else:
                     st.warning("Please provide deployment name")
         
+        # Bulk operations
+        st.subheader("🧰 Bulk Operations")
+        render_bulk_deployment_ops(cluster)
+        
         # Deploy from YAML
         st.subheader("📄 Deploy from YAML")
-        yaml_content = st.text_area("Paste your YAML configuration:", height=200)
+        yaml_content = st.text_area("Paste your YAML configuration (multiple documents allowed):", height=200)
+        col1, col2 = st.columns(2)
+        with col1:
+            apply_namespace = st.text_input("Default Namespace:", value="default")
+        with col2:
+            force_conflicts = st.checkbox("Force field-ownership conflicts")
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            preview = st.button("🔍 Preview (Dry Run)")
+        with col2:
+            deploy = st.button("🚀 Deploy")
         
-        if st.button("🚀 Deploy"):
+        if preview or deploy:
             if yaml_content:
-                # Save YAML to temporary file
-                with open("temp_deployment.yaml", "w") as f:
-                    f.write(yaml_content)
-                
-                success, output, error = run_command("kubectl apply -f temp_deployment.yaml")
-                if success:
-                    st.success("Deployment applied successfully!")
-                    log_command("Kubernetes: Applied deployment from YAML")
-                else:
-                    st.error(f"Error: {error}")
-                
-                # Clean up
-                os.remove("temp_deployment.yaml")
+                try:
+                    objects = parse_manifests(yaml_content)
+                except yaml.YAMLError as e:
+                    st.error(f"Invalid YAML: {e}")
+                    objects = []
+                if objects:
+                    results = apply_manifests(cluster, objects, apply_namespace, dry_run=preview, force=force_conflicts)
+                    failed = [r for r in results if r["Result"].startswith("error")]
+                    if failed:
+                        st.error(f"{len(failed)} of {len(results)} objects failed")
+                    elif deploy:
+                        st.success("Deployment applied successfully!")
+                        log_command(f"Kubernetes: Server-side applied {len(results)} objects from YAML")
+                    render_apply_results(results)
             else:
                 st.warning("Please provide YAML content")
     
     with tab3:
         st.subheader("🌐 Service Management")
         
-        if st.button("📋 List Services"):
-            success, output, error = run_command("kubectl get services -o wide")
-            if success:
-                st.code(output)
-            else:
-                st.error(f"Error: {error}")
+        render_resources("services", namespace)
         
         # Create service
         st.subheader("🌐 Create Service")
         service_name = st.text_input("Service Name:")
+        service_namespace = st.text_input("Service Namespace:", value="default")
         service_type = st.selectbox("Service Type:", ["ClusterIP", "NodePort", "LoadBalancer"])
         port = st.number_input("Port:", min_value=1, max_value=65535, value=80)
         target_port = st.number_input("Target Port:", min_value=1, max_value=65535, value=80)
         
         if st.button("🌐 Create Service"):
             if service_name:
-                cmd = f"kubectl expose deployment {service_name} --type={service_type} --port={port} --target-port={target_port}"
-                success, output, error = run_command(cmd)
-                if success:
+                # Same as `kubectl expose deployment`: reuse the deployment's pod selector
+                try:
+                    deployment = cluster.apps.read_namespaced_deployment(service_name, service_namespace)
+                    service = k8s_client.V1Service(
+                        metadata=k8s_client.V1ObjectMeta(name=service_name),
+                        spec=k8s_client.V1ServiceSpec(
+                            type=service_type,
+                            selector=deployment.spec.selector.match_labels,
+                            ports=[k8s_client.V1ServicePort(port=int(port), target_port=int(target_port))],
+                        ),
+                    )
+                    cluster.core.create_namespaced_service(service_namespace, service)
                     st.success(f"Service {service_name} created!")
                     log_command(f"Kubernetes: Created service {service_name}")
-                else:
-                    st.error(f"Error: {error}")
+                except ApiException as e:
+                    st.error(f"Error: {e.status} {e.reason}")
             else:
                 st.warning("Please provide service name")
     
@@ -558,20 +3006,12 @@ def kubernetes_section():
         with col1:
             st.subheader("📋 ConfigMaps")
             if st.button("📋 List ConfigMaps"):
-                success, output, error = run_command("kubectl get configmaps")
-                if success:
-                    st.code(output)
-                else:
-                    st.error(f"Error: {error}")
+                render_resources("configmaps", namespace)
         
         with col2:
             st.subheader("🔐 Secrets")
             if st.button("📋 List Secrets"):
-                success, output, error = run_command("kubectl get secrets")
-                if success:
-                    st.code(output)
-                else:
-                    st.error(f"Error: {error}")
+                render_resources("secrets", namespace)
     
     with tab5:
         st.subheader("📊 Kubernetes Monitoring")
@@ -579,33 +3019,17 @@ def kubernetes_section():
         col1, col2 = st.columns(2)
         
         with col1:
-            if st.button("📊 Node Status"):
-                success, output, error = run_command("kubectl get nodes -o wide")
-                if success:
-                    st.code(output)
-                else:
-                    st.error(f"Error: {error}")
+            st.subheader("🖥️ Node Status")
+            render_resources("nodes")
         
         with col2:
-            if st.button("📊 Pod Status"):
-                success, output, error = run_command("kubectl get pods -o wide")
-                if success:
-                    st.code(output)
-                else:
-                    st.error(f"Error: {error}")
+            st.subheader("📦 Pod Status")
+            render_resources("pods", namespace)
+        
+        # Logs
+        st.subheader("📜 Pod Logs")
+        render_kube_logs_panel(cluster)
         
         # Resource usage
         st.subheader("📈 Resource Usage")
-        if st.button("📈 Top Pods"):
-            success, output, error = run_command("kubectl top pods")
-            if success:
-                st.code(output)
-            else:
-                st.error(f"Error: {error}")
-        
-        if st.button("📈 Top Nodes"):
-            success, output, error = run_command("kubectl top nodes")
-            if success:
-                st.code(output)
-            else:
-                st.error(f"Error: {error}")
+        render_kube_metrics(cluster)
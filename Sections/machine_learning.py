@@ -5,15 +5,53 @@ import matplotlib.pyplot as plt
 import seaborn as sns
 import plotly.express as px
 import plotly.graph_objects as go
-from sklearn.model_selection import train_test_split, cross_val_score
-from sklearn.linear_model import LinearRegression, LogisticRegression
+from sklearn.model_selection import (train_test_split, cross_val_score, KFold, StratifiedKFold,
+                                     ParameterGrid, ParameterSampler)
+from sklearn.linear_model import LinearRegression, LogisticRegression, SGDRegressor, SGDClassifier
 from sklearn.ensemble import RandomForestClassifier, RandomForestRegressor
 from sklearn.svm import SVC, SVR
+from sklearn.base import is_regressor
 from sklearn.metrics import accuracy_score, classification_report, confusion_matrix, mean_squared_error, r2_score
-from sklearn.preprocessing import StandardScaler, LabelEncoder
+from sklearn.preprocessing import StandardScaler, OrdinalEncoder, FunctionTransformer
+from sklearn.impute import SimpleImputer
+from sklearn.compose import ColumnTransformer
+from sklearn.pipeline import Pipeline
+from pandas.api.types import union_categoricals
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.feather as feather
+import gzip
+import hashlib
+import joblib
+import json
+import os
+import shutil
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
 import io
 import base64
 
+DATASET_CACHE_DIR = os.path.join(".ml_cache", "datasets")
+DATASET_CACHE_MAX_BYTES = 8 << 30
+PLOT_POINT_BUDGET = 5000
+MODEL_REGISTRY_DIR = os.path.join(".ml_cache", "models")
+MODEL_CACHE_SIZE = 4
+PREDICTIONS_DIR = os.path.join(".ml_cache", "predictions")
+PREDICTIONS_MAX_AGE = 24 * 3600
+
+SEARCH_SPACES = {
+    "Linear Regression": {"fit_intercept": [True, False], "positive": [False, True]},
+    "Logistic Regression": {"C": [0.01, 0.1, 1.0, 10.0, 100.0], "class_weight": [None, "balanced"]},
+    "Random Forest": {"n_estimators": [50, 100, 200, 400], "max_depth": [None, 5, 10, 20],
+                      "min_samples_leaf": [1, 2, 5], "max_features": ["sqrt", 1.0]},
+    "Support Vector Machine": {"C": [0.1, 1.0, 10.0, 100.0], "gamma": ["scale", 0.01, 0.1, 1.0],
+                               "kernel": ["rbf", "linear"]},
+}
+
 def log_command(command):
     """Log command to file"""
     with open("command_log.txt", "a") as f:
@@ -36,6 +74,679 @@ def plot_confusion_matrix(y_true, y_pred, classes):
     plt.xlabel('Predicted Label')
     return fig
 
+def infer_compact_dtypes(sample, category_ratio=0.5, max_categories=1000):
+    """Pick columns to read as category from a sample: low-cardinality strings only.
+
+    Numeric dtypes are never pinned from the sample, because a later value the
+    sample did not see (text in a numeric column, data in a column that was
+    empty in the sample) would make the whole read fail; those columns are
+    parsed freely and downcast afterwards.
+    """
+    dtypes = {}
+    for col in sample.columns:
+        series = sample[col]
+        if series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+            n_unique = series.nunique(dropna=True)
+            if n_unique <= max_categories and n_unique <= category_ratio * max(len(series), 1):
+                dtypes[col] = "category"
+    return dtypes
+
+def downcast_frame(df):
+    """Downcast integer and float columns in place of wider numpy types"""
+    for col in df.select_dtypes(include=["integer"]).columns:
+        df[col] = pd.to_numeric(df[col], downcast="integer")
+    for col in df.select_dtypes(include=["float64"]).columns:
+        df[col] = df[col].astype("float32")
+    return df
+
+def concat_chunks(chunks):
+    """Concatenate chunks, unioning categories so category columns stay categorical.
+
+    Chunks are parsed independently, so a column may come back narrower in one
+    chunk than in another (int8 vs float32 vs object); concat widens it to the
+    common dtype and the result is downcast once more at the end.
+    """
+    if not chunks:
+        return pd.DataFrame()
+    df = pd.concat(chunks, ignore_index=True)
+    for col in chunks[0].columns:
+        if all(isinstance(chunk[col].dtype, pd.CategoricalDtype) for chunk in chunks):
+            df[col] = union_categoricals([chunk[col] for chunk in chunks], ignore_order=True)
+    return downcast_frame(df)
+
+def _arrow_chunks(uploaded_file, dtypes, optimize):
+    """Yield pandas chunks from pyarrow's streaming CSV reader, downcast when ``optimize``"""
+    reader = pa_csv.open_csv(uploaded_file, read_options=pa_csv.ReadOptions(block_size=64 << 20))
+    for batch in reader:
+        chunk = batch.to_pandas()
+        if optimize:
+            chunk = downcast_frame(chunk.astype({c: t for c, t in dtypes.items() if c in chunk.columns}))
+        yield chunk
+
+def load_csv_compact(uploaded_file, chunk_rows=200_000, sample_rows=10_000, optimize=True, use_pyarrow=False):
+    """Stream a CSV in chunks into a memory-compact DataFrame.
+
+    Low-cardinality string columns are read as category (picked from a
+    sample), every chunk is downcast after parsing, and the chunks are
+    widened to a common dtype and unified at the end, so peak memory stays
+    close to the size of the compact result while any file plain
+    ``pd.read_csv`` accepts still loads. Returns the frame and an estimate
+    of the footprint a plain ``pd.read_csv`` would have had.
+    """
+    uploaded_file.seek(0)
+    sample = pd.read_csv(uploaded_file, nrows=sample_rows)
+    bytes_per_row = sample.memory_usage(deep=True).sum() / max(len(sample), 1)
+    dtypes = infer_compact_dtypes(sample) if optimize else {}
+    uploaded_file.seek(0)
+
+    chunks = None
+    if use_pyarrow:
+        try:
+            chunks = list(_arrow_chunks(uploaded_file, dtypes, optimize))
+        except pa.ArrowInvalid:
+            # The streaming reader fixes column types from its first block and
+            # rejects a later block that disagrees; pandas parses each chunk freely
+            chunks = None
+            uploaded_file.seek(0)
+    if chunks is None:
+        chunks = []
+        for chunk in pd.read_csv(uploaded_file, chunksize=chunk_rows, dtype=dtypes or None):
+            chunks.append(downcast_frame(chunk) if optimize else chunk)
+    df = concat_chunks(chunks) if optimize else pd.concat(chunks, ignore_index=True)
+    return df, int(bytes_per_row * len(df))
+
+def hash_upload(uploaded_file, block_size=8 << 20):
+    """Content hash of an uploaded file, read in blocks"""
+    digest = hashlib.sha256()
+    uploaded_file.seek(0)
+    for block in iter(lambda: uploaded_file.read(block_size), b""):
+        digest.update(block)
+    uploaded_file.seek(0)
+    return digest.hexdigest()[:32]
+
+def derive_dataset_key(parent_key, step):
+    """Key of the dataset produced by applying ``step`` to ``parent_key``"""
+    return hashlib.sha256(f"{parent_key}|{step}".encode()).hexdigest()[:32]
+
+def dataset_path(key):
+    return os.path.join(DATASET_CACHE_DIR, f"{key}.arrow")
+
+def dataset_cached(key):
+    """Whether ``key`` is in the cache; a hit refreshes its mtime, which eviction treats as last use"""
+    try:
+        os.utime(dataset_path(key))
+        return True
+    except OSError:
+        return False
+
+def evict_dataset_cache(keep=(), max_bytes=DATASET_CACHE_MAX_BYTES):
+    """Delete the least recently used cached datasets (with their meta and fitted step) until under ``max_bytes``.
+
+    Keys in ``keep`` are never removed. Frames already memory-mapped stay
+    readable after their file is unlinked; evicted steps are simply recomputed.
+    """
+    if not os.path.isdir(DATASET_CACHE_DIR):
+        return
+    entries = {}
+    for name in os.listdir(DATASET_CACHE_DIR):
+        path = os.path.join(DATASET_CACHE_DIR, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entry = entries.setdefault(name.split(".")[0], {"files": [], "size": 0, "used": 0.0})
+        entry["files"].append(path)
+        entry["size"] += stat.st_size
+        if name.endswith(".arrow"):
+            entry["used"] = stat.st_mtime
+    total = sum(entry["size"] for entry in entries.values())
+    for key, entry in sorted(entries.items(), key=lambda item: item[1]["used"]):
+        if total <= max_bytes:
+            break
+        if key in keep:
+            continue
+        for path in entry["files"]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        total -= entry["size"]
+
+def prune_predictions(max_age=PREDICTIONS_MAX_AGE):
+    """Delete batch prediction files older than ``max_age`` seconds, e.g. left behind by closed sessions"""
+    if not os.path.isdir(PREDICTIONS_DIR):
+        return
+    cutoff = time.time() - max_age
+    for name in os.listdir(PREDICTIONS_DIR):
+        path = os.path.join(PREDICTIONS_DIR, name)
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+        except OSError:
+            pass
+
+def store_dataset(df, key, meta=None):
+    """Write a frame to the cache as an uncompressed Arrow IPC file so it can be memory-mapped"""
+    os.makedirs(DATASET_CACHE_DIR, exist_ok=True)
+    path = dataset_path(key)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    feather.write_feather(df.reset_index(drop=True), tmp_path, compression="uncompressed")
+    os.replace(tmp_path, path)
+    with open(os.path.join(DATASET_CACHE_DIR, f"{key}.json"), "w") as f:
+        json.dump(meta or {}, f)
+
+def dataset_meta(key):
+    try:
+        with open(os.path.join(DATASET_CACHE_DIR, f"{key}.json")) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def load_dataset(key):
+    """Memory-map a cached dataset; the frame is shared across reruns and must not be mutated"""
+    with pa.memory_map(dataset_path(key), "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas(split_blocks=True)
+
+def cached_step(parent_key, step, func, df):
+    """Apply ``func`` to ``df`` unless the result for (parent_key, step) is already cached.
+
+    Returns the (memory-mapped) result frame and its key. ``func`` must return
+    a new frame rather than modify ``df``.
+    """
+    key = derive_dataset_key(parent_key, step)
+    if not dataset_cached(key):
+        store_dataset(func(df), key)
+    return load_dataset(key), key
+
+def column_step(name, transformer, columns):
+    """Wrap a transformer so it only touches ``columns`` and passes the rest through, keeping names"""
+    return ColumnTransformer([(name, transformer, columns)], remainder="passthrough",
+                             verbose_feature_names_out=False).set_output(transform="pandas")
+
+def preprocessing_plan(df, spec):
+    """Turn a preprocessing spec into an ordered list of (name, unfitted step, params).
+
+    ``params`` fully describes the step and is hashed together with the input
+    key, so a step is refitted only when its input or its own settings change.
+    """
+    target = spec.get("target")
+    features = [c for c in df.columns if c != target]
+    numeric = [c for c in features if pd.api.types.is_numeric_dtype(df[c])]
+    encode = [c for c in spec.get("encode", []) if c in features and c not in numeric]
+    steps = []
+    if spec.get("missing") == "mean" and numeric:
+        steps.append(("impute", column_step("impute", SimpleImputer(strategy="mean"), numeric),
+                      {"strategy": "mean", "columns": numeric}))
+    if encode:
+        encoder = OrdinalEncoder(handle_unknown="use_encoded_value", unknown_value=-1,
+                                 encoded_missing_value=-1)
+        steps.append(("encode", column_step("encode", encoder, encode), {"columns": encode}))
+    if spec.get("scale") and numeric + encode:
+        steps.append(("scale", column_step("scale", StandardScaler(), numeric + encode),
+                      {"columns": numeric + encode}))
+    return steps
+
+def fitted_step_path(key):
+    return os.path.join(DATASET_CACHE_DIR, f"{key}.joblib")
+
+@st.cache_resource(max_entries=32, show_spinner=False)
+def load_fitted_step(key):
+    return joblib.load(fitted_step_path(key))
+
+def run_preprocessing(dataset_key, spec):
+    """Apply a preprocessing spec with every step memoized in the dataset cache.
+
+    Each step's key is derived from its input key and parameters; steps whose
+    output and fitted transformer are already cached are loaded, and fitting
+    resumes from the first changed step. The target column is never
+    transformed. Returns the processed frame, its key, the fitted
+    ``Pipeline`` (``None`` when there are no steps) and how many steps were fitted.
+    """
+    target = spec.get("target")
+    key = dataset_key
+    if spec.get("missing") == "drop":
+        _, key = cached_step(key, "dropna", lambda d: d.dropna(), load_dataset(key))
+
+    data = None
+    fitted = []
+    n_fitted = 0
+    for name, step, params in preprocessing_plan(load_dataset(key), spec):
+        step_key = derive_dataset_key(key, json.dumps([name, params], sort_keys=True))
+        if not (dataset_cached(step_key) and os.path.exists(fitted_step_path(step_key))):
+            if data is None:
+                data = load_dataset(key)
+            features = data.drop(columns=[target]) if target else data
+            out = step.fit_transform(features)
+            if target:
+                out[target] = data[target].to_numpy()
+            store_dataset(out, step_key)
+            joblib.dump(step, fitted_step_path(step_key))
+            data = out
+            n_fitted += 1
+        else:
+            data = None
+        fitted.append((name, load_fitted_step(step_key)))
+        key = step_key
+    return load_dataset(key), key, (Pipeline(fitted) if fitted else None), n_fitted
+
+def transform_features(preprocessor, raw, features):
+    """Apply the fitted preprocessing to raw rows and select the model's features"""
+    out = preprocessor.transform(raw) if preprocessor is not None else raw
+    return out[features]
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def input_defaults(dataset_key, columns):
+    """Default raw value per column: mean for numeric, most frequent otherwise"""
+    df = load_dataset(dataset_key)
+    defaults = {}
+    for col in columns:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            defaults[col] = float(df[col].mean())
+        else:
+            mode = df[col].mode(dropna=True)
+            defaults[col] = mode.iloc[0] if len(mode) else None
+    return defaults
+
+def finite_values(series):
+    values = series.to_numpy(dtype="float64", na_value=np.nan)
+    return values[np.isfinite(values)]
+
+def sample_indices(n, budget, seed=0):
+    """Sorted uniform sample of at most ``budget`` positions out of ``n``"""
+    if n <= budget:
+        return np.arange(n)
+    return np.sort(np.random.default_rng(seed).choice(n, size=budget, replace=False))
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def histogram_figure(dataset_key, col, bins=50):
+    """Histogram binned with numpy on the server; only bin edges and counts reach the browser"""
+    counts, edges = np.histogram(finite_values(load_dataset(dataset_key)[col]), bins=bins)
+    fig = go.Figure(go.Bar(x=(edges[:-1] + edges[1:]) / 2, y=counts, width=np.diff(edges), name=col))
+    fig.update_layout(title=f"Distribution of {col}", xaxis_title=col, yaxis_title="count", bargap=0)
+    return fig
+
+@st.cache_data(max_entries=64, show_spinner=False)
+def box_figure(dataset_key, col, max_outliers=PLOT_POINT_BUDGET // 5):
+    """Box plot from precomputed quartiles, with a sample of the outliers"""
+    values = finite_values(load_dataset(dataset_key)[col])
+    fig = go.Figure()
+    if len(values):
+        q1, median, q3 = np.percentile(values, [25, 50, 75])
+        iqr = q3 - q1
+        inside = values[(values >= q1 - 1.5 * iqr) & (values <= q3 + 1.5 * iqr)]
+        fig.add_trace(go.Box(name=col, q1=[q1], median=[median], q3=[q3], mean=[values.mean()],
+                             lowerfence=[inside.min()], upperfence=[inside.max()], boxpoints=False))
+        outliers = values[(values < inside.min()) | (values > inside.max())]
+        outliers = outliers[sample_indices(len(outliers), max_outliers)]
+        if len(outliers):
+            fig.add_trace(go.Scatter(x=[col] * len(outliers), y=outliers, mode="markers",
+                                     name="outliers", marker=dict(size=4)))
+    fig.update_layout(title=f"Box Plot of {col}", showlegend=False)
+    return fig
+
+@st.cache_data(max_entries=16, show_spinner=False)
+def correlation_figure(dataset_key, cols):
+    corr_matrix = load_dataset(dataset_key)[list(cols)].corr()
+    return px.imshow(corr_matrix, title="Correlation Matrix", color_continuous_scale='RdBu')
+
+def actual_vs_predicted_figure(y_true, y_pred, budget=PLOT_POINT_BUDGET):
+    """Scatter of a uniform sample of (actual, predicted) pairs capped at ``budget`` points"""
+    y_true = np.asarray(y_true)
+    y_pred = np.asarray(y_pred)
+    idx = sample_indices(len(y_true), budget)
+    title = "Actual vs Predicted Values"
+    if len(idx) < len(y_true):
+        title += f" ({len(idx):,} of {len(y_true):,} points)"
+    fig = px.scatter(x=y_true[idx], y=y_pred[idx], title=title, labels={'x': 'Actual', 'y': 'Predicted'})
+    fig.add_trace(go.Scatter(x=[y_true.min(), y_true.max()],
+                             y=[y_true.min(), y_true.max()],
+                             mode='lines', name='Perfect Prediction'))
+    return fig
+
+def registered_is_regression(meta, model):
+    """Task of a registered model; versions saved without the flag fall back to the estimator type"""
+    return meta.get("is_regression", is_regressor(model))
+
+def evaluation_metrics(is_regression, y_test, y_pred):
+    if is_regression:
+        return {"mse": float(mean_squared_error(y_test, y_pred)), "r2": float(r2_score(y_test, y_pred))}
+    return {"accuracy": float(accuracy_score(y_test, y_pred))}
+
+def register_model(model, preprocessor, meta, y_test, y_pred):
+    """Persist a fitted model, its preprocessing pipeline and evaluation arrays as a new version.
+
+    The artifact goes to ``<version>.joblib`` and the metadata (features,
+    target, metrics, training time, data hash, ...) to ``<version>.json`` so
+    the registry can be listed without unpickling models.
+    """
+    os.makedirs(MODEL_REGISTRY_DIR, exist_ok=True)
+    version = f"{datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6]}"
+    artifact = {"model": model, "preprocessor": preprocessor,
+                "y_test": np.asarray(y_test), "y_pred": np.asarray(y_pred)}
+    path = os.path.join(MODEL_REGISTRY_DIR, f"{version}.joblib")
+    joblib.dump(artifact, f"{path}.tmp")
+    os.replace(f"{path}.tmp", path)
+    meta = dict(meta, version=version, registered_at=datetime.now().isoformat(timespec="seconds"))
+    with open(os.path.join(MODEL_REGISTRY_DIR, f"{version}.json"), "w") as f:
+        json.dump(meta, f, default=str)
+    return version
+
+def list_models():
+    """Metadata of every registered version, newest first"""
+    if not os.path.isdir(MODEL_REGISTRY_DIR):
+        return []
+    models = []
+    for name in sorted(os.listdir(MODEL_REGISTRY_DIR), reverse=True):
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(MODEL_REGISTRY_DIR, name)) as f:
+                    models.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    return models
+
+def model_label(meta):
+    metrics = ", ".join(f"{k}={v:.3f}" for k, v in meta.get("metrics", {}).items())
+    return f"{meta['version']} · {meta['model_type']} → {meta['target']} ({metrics})"
+
+class ModelCache:
+    """Bounded LRU of loaded model artifacts, shared by all sessions of the process"""
+
+    def __init__(self, capacity=MODEL_CACHE_SIZE):
+        self.capacity = capacity
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, version):
+        with self.lock:
+            if version in self.items:
+                self.items.move_to_end(version)
+                return self.items[version]
+        artifact = joblib.load(os.path.join(MODEL_REGISTRY_DIR, f"{version}.joblib"))
+        with self.lock:
+            self.items[version] = artifact
+            self.items.move_to_end(version)
+            while len(self.items) > self.capacity:
+                self.items.popitem(last=False)
+        return artifact
+
+model_cache = ModelCache()
+
+def register_session_model(model, model_type, features, target, y_test, y_pred, training_seconds, **extra):
+    """Register a model trained on the current session's processed data and make it the session model"""
+    is_regression = is_regressor(model)
+    preprocessor = st.session_state.get('preprocessor')
+    inputs = list(preprocessor.feature_names_in_) if preprocessor is not None else list(features)
+    defaults = input_defaults(st.session_state.dataset_key, tuple(inputs))
+    raw_df = load_dataset(st.session_state.dataset_key)
+    choices = {}
+    for col in inputs:
+        if col in features and not pd.api.types.is_numeric_dtype(raw_df[col]):
+            choices[col] = (raw_df[col].cat.categories.tolist() if isinstance(raw_df[col].dtype, pd.CategoricalDtype)
+                            else raw_df[col].dropna().unique()[:1000].tolist())
+    meta = {
+        "model_type": model_type,
+        "features": list(features),
+        "target": target,
+        "inputs": inputs,
+        "defaults": defaults,
+        "choices": choices,
+        "is_regression": is_regression,
+        "metrics": evaluation_metrics(is_regression, y_test, y_pred),
+        "training_seconds": round(training_seconds, 3),
+        "data_hash": st.session_state.get('processed_key'),
+        "dataset_key": st.session_state.dataset_key,
+        **extra,
+    }
+    version = register_model(model, preprocessor, meta, y_test, y_pred)
+    st.session_state.model_version = version
+    return version
+
+def pick_model_version(models, key):
+    """Version selector defaulting to the session's most recent model"""
+    versions = [m["version"] for m in models]
+    current = st.session_state.get('model_version')
+    index = versions.index(current) if current in versions else 0
+    by_version = {m["version"]: m for m in models}
+    version = st.selectbox("Model version:", versions, index=index, key=key,
+                           format_func=lambda v: model_label(by_version[v]))
+    return by_version[version], model_cache.get(version)
+
+def make_estimator(model_type, is_regression, params=None):
+    """Estimator for a model type with the tab's default settings, overridden by ``params``"""
+    if model_type == "Linear Regression":
+        model = LinearRegression()
+    elif model_type == "Logistic Regression":
+        model = LogisticRegression(max_iter=1000)
+    elif model_type == "Random Forest":
+        model = (RandomForestRegressor if is_regression else RandomForestClassifier)(n_estimators=100, random_state=42)
+    else:
+        model = SVR() if is_regression else SVC()
+    return model.set_params(**(params or {}))
+
+def search_candidates(model_type, strategy, n_candidates, seed=42):
+    """Every grid point for grid search, otherwise a random sample of ``n_candidates`` points"""
+    space = SEARCH_SPACES[model_type]
+    grid = list(ParameterGrid(space))
+    if strategy == "Grid" or len(grid) <= n_candidates:
+        return grid
+    return list(ParameterSampler(space, n_iter=n_candidates, random_state=seed))
+
+@st.cache_resource(max_entries=8, show_spinner=False)
+def fold_splits(data_key, target, test_size, n_splits, stratify, _y):
+    """CV folds over the training split, cached per dataset, target and split settings.
+
+    Training indices are shuffled once so successive halving can take a
+    prefix of each fold as a smaller random subsample.
+    """
+    y = np.asarray(_y)
+    if stratify and pd.Series(y).value_counts().min() >= n_splits:
+        splitter = StratifiedKFold(n_splits=n_splits, shuffle=True, random_state=42)
+    else:
+        splitter = KFold(n_splits=n_splits, shuffle=True, random_state=42)
+    rng = np.random.default_rng(42)
+    return [(rng.permutation(train_idx), test_idx) for train_idx, test_idx in splitter.split(np.zeros(len(y)), y)]
+
+_search_data = None
+
+def _init_search_worker(X, y, folds):
+    """Process pool initializer: keep the training arrays and folds in the worker"""
+    global _search_data
+    _search_data = (X, y, folds)
+
+def _run_trial(model_type, is_regression, params, n_rows=None):
+    X, y, folds = _search_data
+    started = time.perf_counter()
+    scores = []
+    for train_idx, test_idx in folds:
+        train_idx = train_idx[:n_rows] if n_rows else train_idx
+        model = make_estimator(model_type, is_regression, params).fit(X[train_idx], y[train_idx])
+        scores.append(model.score(X[test_idx], y[test_idx]))
+    return float(np.mean(scores)), float(np.std(scores)), time.perf_counter() - started
+
+def halving_schedule(n_candidates, n_train, factor=3, min_rows=100):
+    """Training rows per successive-halving round; the last round uses all rows"""
+    rounds = 1
+    while n_candidates > factor:
+        n_candidates = -(-n_candidates // factor)
+        rounds += 1
+    return [max(n_train // factor ** (rounds - 1 - r), min(min_rows, n_train)) for r in range(rounds)]
+
+def run_hyperparameter_search(X, y, folds, model_type, is_regression, strategy, n_candidates=20,
+                              workers=2, patience=0, factor=3, on_trial=None):
+    """Cross-validate candidate parameter sets in a process pool.
+
+    Trials are reported through ``on_trial(results)`` as they finish. Grid and
+    random search stop early once ``patience`` consecutive trials fail to
+    beat the best score; successive halving keeps the top 1/``factor`` of
+    each round and grows the training subsample until the last round runs on
+    full folds. Returns the best result and all results.
+    """
+    candidates = search_candidates(model_type, strategy, n_candidates)
+    halving = strategy == "Successive halving"
+    n_train = min(len(train_idx) for train_idx, _ in folds)
+    schedule = halving_schedule(len(candidates), n_train, factor) if halving else [None]
+    results = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_search_worker, initargs=(X, y, folds)) as pool:
+        for round_idx, n_rows in enumerate(schedule):
+            futures = {pool.submit(_run_trial, model_type, is_regression, params, n_rows): params
+                       for params in candidates}
+            round_results = []
+            best_score, since_best = -np.inf, 0
+            for future in as_completed(futures):
+                score, std, seconds = future.result()
+                row = {"round": round_idx + 1, "rows": n_rows or n_train, "params": futures[future],
+                       "score": score, "std": std, "seconds": seconds}
+                results.append(row)
+                round_results.append(row)
+                if on_trial:
+                    on_trial(results)
+                if score > best_score:
+                    best_score, since_best = score, 0
+                else:
+                    since_best += 1
+                if patience and not halving and since_best >= patience:
+                    for pending in futures:
+                        pending.cancel()
+                    break
+            round_results.sort(key=lambda r: r["score"], reverse=True)
+            candidates = [r["params"] for r in round_results[:max(1, -(-len(round_results) // factor))]]
+    return round_results[0], results
+
+def leaderboard_frame(results, top=10):
+    rows = [{"round": r["round"], "rows": r["rows"], **{k: str(v) for k, v in r["params"].items()},
+             "score": r["score"], "std": r["std"], "seconds": r["seconds"]} for r in results]
+    return pd.DataFrame(rows).sort_values(["round", "score"], ascending=False).head(top).reset_index(drop=True)
+
+def stream_csv_chunks(path, columns, chunk_rows):
+    """Yield chunks of ``columns`` from a CSV on disk with the fraction of the file consumed"""
+    size = max(os.path.getsize(path), 1)
+    with open(path, "rb") as f:
+        for chunk in pd.read_csv(f, usecols=columns, chunksize=chunk_rows):
+            yield chunk, min(f.tell() / size, 1.0)
+
+def scan_classes(path, target, chunk_rows=500_000):
+    classes = set()
+    for chunk, _ in stream_csv_chunks(path, [target], chunk_rows):
+        classes.update(chunk[target].dropna().unique().tolist())
+    return np.array(sorted(classes))
+
+def parse_classes(text):
+    parts = [p.strip() for p in text.split(",") if p.strip()]
+    try:
+        return np.array(sorted(float(p) for p in parts))
+    except ValueError:
+        return np.array(sorted(parts))
+
+def train_out_of_core(path, features, target, is_regression, classes=None, chunk_rows=100_000,
+                      batch_size=1_000, epochs=1, alpha=1e-4, on_chunk=None):
+    """Fit an SGD linear or logistic model on a CSV streamed from disk.
+
+    The scaler is fitted incrementally during the first pass and missing
+    feature values become the running mean. Each chunk is scored before the
+    model learns from it (progressive validation), giving a learning curve
+    without a separate holdout; after the first epoch those scores are no
+    longer out-of-sample. Returns the fitted Pipeline, the curve, the last
+    scored (y, y_pred) pair and the number of rows trained on.
+    """
+    if is_regression:
+        model = SGDRegressor(alpha=alpha, random_state=42)
+    else:
+        model = SGDClassifier(loss="log_loss", alpha=alpha, random_state=42)
+    scaler = StandardScaler()
+    curve = []
+    rows = 0
+    last = None
+    for epoch in range(epochs):
+        for chunk, fraction in stream_csv_chunks(path, features + [target], chunk_rows):
+            chunk = chunk.dropna(subset=[target])
+            if chunk.empty:
+                continue
+            if epoch == 0:
+                scaler.partial_fit(chunk[features])
+            X = np.nan_to_num(scaler.transform(chunk[features]))
+            y = chunk[target].to_numpy()
+            if rows:
+                y_pred = model.predict(X)
+                score = r2_score(y, y_pred) if is_regression else accuracy_score(y, y_pred)
+                curve.append({"rows": rows, "epoch": epoch + 1, "score": score})
+                last = (y, y_pred)
+            for start in range(0, len(X), batch_size):
+                if is_regression:
+                    model.partial_fit(X[start:start + batch_size], y[start:start + batch_size])
+                else:
+                    model.partial_fit(X[start:start + batch_size], y[start:start + batch_size], classes=classes)
+            rows += len(X)
+            if on_chunk:
+                on_chunk(rows, epoch + 1, fraction, curve)
+    if rows == 0:
+        raise ValueError("No rows with a target value were found")
+    if last is None:
+        last = (y, model.predict(X))
+    fill = FunctionTransformer(np.nan_to_num).fit(X[:1])
+    return Pipeline([("scale", scaler), ("fill", fill), ("model", model)]), curve, last, rows
+
+_score_artifact = None
+
+def _init_score_worker(artifact_path):
+    """Process pool initializer: load the model artifact once per worker"""
+    global _score_artifact
+    _score_artifact = joblib.load(artifact_path)
+
+def _score_chunk(chunk, inputs, features, defaults):
+    # Columns the pipeline expects but the file lacks fall back to training defaults
+    raw = chunk.assign(**{c: defaults[c] for c in inputs if c not in chunk})[inputs]
+    return _score_artifact["model"].predict(transform_features(_score_artifact["preprocessor"], raw, features))
+
+def stream_batch_predictions(source, meta, out_path, chunk_rows=100_000, workers=2, on_progress=None):
+    """Score a CSV chunk by chunk in worker processes and append results to ``out_path``.
+
+    At most ``2 * workers`` chunks are in flight and results are written in
+    input order as soon as the oldest chunk finishes, so memory stays flat
+    regardless of file size. Returns (rows scored, elapsed seconds).
+    """
+    artifact_path = os.path.abspath(os.path.join(MODEL_REGISTRY_DIR, f"{meta['version']}.joblib"))
+    started = time.perf_counter()
+    rows = 0
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_score_worker, initargs=(artifact_path,)) as pool, \
+            open(out_path, "w", newline="") as out:
+
+        def write_oldest():
+            nonlocal rows
+            chunk, future = pending.popleft()
+            chunk["Prediction"] = future.result()
+            chunk.to_csv(out, index=False, header=rows == 0)
+            rows += len(chunk)
+            if on_progress:
+                on_progress(rows, rows / max(time.perf_counter() - started, 1e-9))
+
+        for chunk in pd.read_csv(source, chunksize=chunk_rows):
+            pending.append((chunk, pool.submit(_score_chunk, chunk, meta["inputs"], meta["features"], meta["defaults"])))
+            if len(pending) >= 2 * workers:
+                write_oldest()
+        while pending:
+            write_oldest()
+    return rows, time.perf_counter() - started
+
+def compress_file(path):
+    """Gzip a file next to itself, streaming in blocks; reuses an existing archive"""
+    gz_path = f"{path}.gz"
+    if not os.path.exists(gz_path):
+        with open(path, "rb") as src, gzip.open(f"{gz_path}.tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst, 1 << 20)
+        os.replace(f"{gz_path}.tmp", gz_path)
+    return gz_path
+
+def format_memory(num_bytes):
+    """Human readable memory size"""
+    for unit in ["B", "KB", "MB", "GB"]:
+        if num_bytes < 1024 or unit == "GB":
+            return f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+
 def machine_learning_section():
     st.markdown('<h1 class="section-header">🧠 Machine Learning Platform</h1>', unsafe_allow_html=True)
     
@@ -57,11 +768,44 @@ def machine_learning_section():
             help="Upload your dataset in CSV format"
         )
         
+        with st.expander("⚙️ Ingestion Options"):
+            optimize_dtypes = st.checkbox("Downcast numeric columns and use categories for low-cardinality text", value=True)
+            chunk_rows = st.number_input("Rows per chunk", min_value=10_000, max_value=5_000_000, value=200_000, step=50_000)
+            use_pyarrow = st.checkbox("Use pyarrow CSV reader", value=False,
+                                      help="Faster multi-threaded parsing")
+        
         if uploaded_file is not None:
             try:
-                df = pd.read_csv(uploaded_file)
+                # Hash each upload once; the parsed frame lives in the Arrow cache keyed by
+                # content and options, so reruns and new sessions memory-map it instead of re-parsing
+                # file_id changes on every upload, even of a same-named, same-sized file
+                upload_sig = uploaded_file.file_id
+                if st.session_state.get("upload_sig") != upload_sig:
+                    with st.spinner("Hashing upload..."):
+                        st.session_state.upload_hash = hash_upload(uploaded_file)
+                    st.session_state.upload_sig = upload_sig
+                dataset_key = derive_dataset_key(st.session_state.upload_hash, f"ingest:{optimize_dtypes}:{use_pyarrow}")
+                if not dataset_cached(dataset_key):
+                    with st.spinner("Reading dataset in chunks..."):
+                        parsed, naive_bytes = load_csv_compact(uploaded_file, int(chunk_rows), optimize=optimize_dtypes,
+                                                               use_pyarrow=use_pyarrow)
+                        store_dataset(parsed, dataset_key, {"name": uploaded_file.name, "naive_bytes": naive_bytes})
+                        del parsed
+                    evict_dataset_cache(keep={dataset_key})
+                df = load_dataset(dataset_key)
+                st.session_state.dataset_key = dataset_key
                 st.success(f"✅ Dataset loaded successfully! Shape: {df.shape}")
                 
+                compact_bytes = df.memory_usage(deep=True).sum()
+                naive_bytes = dataset_meta(dataset_key).get("naive_bytes", compact_bytes)
+                col1, col2, col3 = st.columns(3)
+                with col1:
+                    st.metric("Default pandas (est.)", format_memory(naive_bytes))
+                with col2:
+                    st.metric("Loaded", format_memory(compact_bytes))
+                with col3:
+                    st.metric("Reduction", f"{naive_bytes / max(compact_bytes, 1):.1f}x")
+                
                 # Display basic info
                 col1, col2 = st.columns(2)
                 with col1:
@@ -83,7 +827,7 @@ def machine_learning_section():
                 
                 # Select columns for visualization
                 numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-                categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
+                categorical_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
                 
                 if numeric_cols:
                     col1, col2 = st.columns(2)
@@ -91,21 +835,19 @@ def machine_learning_section():
                     with col1:
                         # Histogram
                         selected_col = st.selectbox("Select column for histogram:", numeric_cols)
-                        fig = px.histogram(df, x=selected_col, title=f"Distribution of {selected_col}")
+                        bins = st.slider("Bins:", 10, 200, 50, 10)
+                        fig = histogram_figure(dataset_key, selected_col, bins)
                         st.plotly_chart(fig, use_container_width=True)
                     
                     with col2:
                         # Box plot
-                        fig = px.box(df, y=selected_col, title=f"Box Plot of {selected_col}")
+                        fig = box_figure(dataset_key, selected_col)
                         st.plotly_chart(fig, use_container_width=True)
                 
                 # Correlation matrix for numeric columns
                 if len(numeric_cols) > 1:
                     st.subheader("🔗 Correlation Matrix")
-                    corr_matrix = df[numeric_cols].corr()
-                    fig = px.imshow(corr_matrix, 
-                                  title="Correlation Matrix",
-                                  color_continuous_scale='RdBu')
+                    fig = correlation_figure(dataset_key, tuple(numeric_cols))
                     st.plotly_chart(fig, use_container_width=True)
                 
                 # Store dataframe in session state
@@ -124,48 +866,57 @@ def machine_learning_section():
         if 'df' not in st.session_state:
             st.warning("Please upload a dataset first in the 'Data Upload & Analysis' tab.")
         else:
-            df = st.session_state.df.copy()
+            # The widgets below describe the pipeline declaratively; their state persists across
+            # reruns and only steps whose input or settings changed are refitted
+            raw_df = st.session_state.df
+            dataset_key = st.session_state.dataset_key
+            
+            target = st.selectbox("Target column (left untransformed):", [None] + raw_df.columns.tolist(),
+                                  format_func=lambda c: "— none —" if c is None else c, key="prep_target")
             
             # Handle missing values
             st.subheader("🧹 Missing Values")
-            missing_data = df.isnull().sum()
+            missing_data = raw_df.isnull().sum()
             if missing_data.sum() > 0:
                 st.write("Missing values found:")
                 st.dataframe(missing_data[missing_data > 0])
-                
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button("Remove rows with missing values"):
-                        df = df.dropna()
-                        st.success(f"Removed missing values. New shape: {df.shape}")
-                
-                with col2:
-                    if st.button("Fill missing values with mean (numeric)"):
-                        numeric_cols = df.select_dtypes(include=[np.number]).columns
-                        df[numeric_cols] = df[numeric_cols].fillna(df[numeric_cols].mean())
-                        st.success("Filled missing numeric values with mean")
             else:
                 st.success("✅ No missing values found!")
+            missing_choice = st.radio("Missing values:", ["Keep", "Remove rows with missing values",
+                                                          "Fill missing values with mean (numeric)"],
+                                      horizontal=True, key="prep_missing")
             
             # Handle categorical variables
+            encode_cols = []
             if st.session_state.categorical_cols:
                 st.subheader("🏷️ Categorical Variables")
                 for col in st.session_state.categorical_cols:
-                    if st.checkbox(f"Encode {col}"):
-                        le = LabelEncoder()
-                        df[col] = le.fit_transform(df[col])
-                        st.success(f"Encoded {col}")
+                    if col != target and st.checkbox(f"Encode {col}", key=f"prep_encode_{col}"):
+                        encode_cols.append(col)
             
             # Feature scaling
             st.subheader("⚖️ Feature Scaling")
-            if st.checkbox("Apply Standard Scaling to numeric features"):
-                scaler = StandardScaler()
-                numeric_cols = df.select_dtypes(include=[np.number]).columns
-                df[numeric_cols] = scaler.fit_transform(df[numeric_cols])
-                st.success("Applied Standard Scaling")
+            scale = st.checkbox("Apply Standard Scaling to numeric features", key="prep_scale")
+            
+            spec = {
+                "target": target,
+                "missing": {"Keep": "keep", "Remove rows with missing values": "drop"}.get(missing_choice, "mean"),
+                "encode": encode_cols,
+                "scale": scale,
+            }
+            with st.spinner("Applying preprocessing..."):
+                df, key, preprocessor, n_fitted = run_preprocessing(dataset_key, spec)
+                if n_fitted:
+                    evict_dataset_cache(keep={dataset_key, key})
+            if preprocessor is not None:
+                st.caption(f"Pipeline: {' → '.join(preprocessor.named_steps)} · "
+                           f"{n_fitted} step(s) fitted, {len(preprocessor.steps) - n_fitted} reused from cache")
             
             # Update session state
+            st.session_state.prep_spec = spec
+            st.session_state.preprocessor = preprocessor
             st.session_state.df_processed = df
+            st.session_state.processed_key = key
             st.subheader("✅ Preprocessed Data Preview")
             st.dataframe(df.head())
             
@@ -189,7 +940,9 @@ def machine_learning_section():
             
             # Target variable selection
             numeric_cols = df.select_dtypes(include=[np.number]).columns.tolist()
-            target_col = st.selectbox("Select Target Variable:", numeric_cols)
+            prep_target = st.session_state.get('prep_spec', {}).get('target')
+            target_index = numeric_cols.index(prep_target) if prep_target in numeric_cols else 0
+            target_col = st.selectbox("Select Target Variable:", numeric_cols, index=target_index)
             
             # Feature selection
             feature_cols = [col for col in numeric_cols if col != target_col]
@@ -203,79 +956,189 @@ def machine_learning_section():
                 test_size = st.slider("Test Size:", 0.1, 0.5, 0.2, 0.05)
                 X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=test_size, random_state=42)
                 
+                is_regression = len(y.unique()) > 10
+                training_mode = st.radio("Training mode:", ["Fixed parameters", "Hyperparameter search"], horizontal=True)
+                
                 # Train model
-                if st.button("🚀 Train Model"):
+                if training_mode == "Fixed parameters" and st.button("🚀 Train Model"):
                     with st.spinner("Training model..."):
-                        if model_type == "Linear Regression":
-                            model = LinearRegression()
-                        elif model_type == "Logistic Regression":
-                            model = LogisticRegression()
-                        elif model_type == "Random Forest":
-                            if len(y.unique()) > 10:  # Regression
-                                model = RandomForestRegressor(n_estimators=100, random_state=42)
-                            else:  # Classification
-                                model = RandomForestClassifier(n_estimators=100, random_state=42)
-                        elif model_type == "Support Vector Machine":
-                            if len(y.unique()) > 10:  # Regression
-                                model = SVR()
-                            else:  # Classification
-                                model = SVC()
+                        model = make_estimator(model_type, is_regression)
                         
+                        started = time.perf_counter()
                         model.fit(X_train, y_train)
+                        training_seconds = time.perf_counter() - started
                         y_pred = model.predict(X_test)
                         
-                        # Store model and results
-                        st.session_state.model = model
-                        st.session_state.X_test = X_test
-                        st.session_state.y_test = y_test
-                        st.session_state.y_pred = y_pred
-                        st.session_state.model_type = model_type
+                        # Register the model together with the pipeline it was trained behind, so
+                        # later edits in the preprocessing tab cannot desync predictions
+                        version = register_session_model(model, model_type, selected_features, target_col,
+                                                         y_test, y_pred, training_seconds)
                         
-                        st.success(f"✅ {model_type} trained successfully!")
+                        st.success(f"✅ {model_type} trained successfully! Registered as version {version}")
                         
                         # Cross-validation
                         cv_scores = cross_val_score(model, X, y, cv=5)
                         st.metric("Cross-validation Score", f"{cv_scores.mean():.3f} (+/- {cv_scores.std() * 2:.3f})")
                         
                         log_command(f"Trained {model_type} model on {len(selected_features)} features")
+                
+                elif training_mode == "Hyperparameter search":
+                    st.caption("Search space: " + ", ".join(f"{k} ∈ {v}" for k, v in SEARCH_SPACES[model_type].items()))
+                    col1, col2, col3 = st.columns(3)
+                    with col1:
+                        strategy = st.selectbox("Strategy:", ["Grid", "Random", "Successive halving"])
+                        n_candidates = st.number_input("Candidates (random / halving):", 2, 200, 20)
+                    with col2:
+                        n_splits = st.slider("CV folds:", 2, 10, 3)
+                        search_workers = st.slider("Worker processes:", 1, os.cpu_count() or 1, min(4, os.cpu_count() or 1),
+                                                   key="search_workers")
+                    with col3:
+                        patience = st.number_input("Early stopping patience (0 = off):", 0, 100, 10,
+                                                   help="Stop after this many trials without improvement (grid / random)")
+                    
+                    if st.button("🔍 Run Search"):
+                        folds = fold_splits(st.session_state.get('processed_key'), target_col, test_size, n_splits,
+                                            not is_regression, y_train)
+                        leaderboard = st.empty()
+                        def show_leaderboard(results):
+                            leaderboard.dataframe(leaderboard_frame(results), use_container_width=True)
+                        
+                        with st.spinner("Searching..."):
+                            started = time.perf_counter()
+                            best, results = run_hyperparameter_search(
+                                X_train.to_numpy(), y_train.to_numpy(), folds, model_type, is_regression, strategy,
+                                int(n_candidates), search_workers, int(patience), on_trial=show_leaderboard)
+                            model = make_estimator(model_type, is_regression, best["params"]).fit(X_train, y_train)
+                            training_seconds = time.perf_counter() - started
+                        y_pred = model.predict(X_test)
+                        version = register_session_model(
+                            model, model_type, selected_features, target_col, y_test, y_pred, training_seconds,
+                            search={"strategy": strategy, "params": best["params"], "cv_score": best["score"],
+                                    "trials": len(results)})
+                        
+                        st.success(f"✅ Best of {len(results)} trials: {best['params']} "
+                                   f"(CV score {best['score']:.3f}). Registered as version {version}")
+                        log_command(f"Tuned {model_type} with {strategy} search over {len(results)} trials")
+        
+        # Out-of-core training streams a CSV from the server's disk instead of the uploaded frame
+        st.divider()
+        st.subheader("💽 Out-of-Core Training")
+        st.caption("SGD-based linear / logistic models trained with partial_fit on a CSV streamed in chunks")
+        ooc_path = st.text_input("CSV path on the server:", key="ooc_path")
+        
+        if ooc_path and not os.path.isfile(ooc_path):
+            st.error(f"File not found: {ooc_path}")
+        elif ooc_path:
+            try:
+                header = pd.read_csv(ooc_path, nrows=1_000)
+                ooc_numeric = header.select_dtypes(include=[np.number]).columns.tolist()
+                st.write(f"File size: {format_memory(os.path.getsize(ooc_path))}")
+                
+                col1, col2 = st.columns(2)
+                with col1:
+                    ooc_target = st.selectbox("Target column:", header.columns.tolist(), key="ooc_target")
+                    ooc_features = st.multiselect("Feature columns:", [c for c in ooc_numeric if c != ooc_target],
+                                                  default=[c for c in ooc_numeric if c != ooc_target], key="ooc_features")
+                    ooc_task = st.radio("Model:", ["Linear Regression (SGDRegressor)",
+                                                   "Logistic Regression (SGDClassifier, log loss)"], key="ooc_task")
+                    ooc_classes = st.text_input("Classes (comma-separated, blank = scan target column):", key="ooc_classes",
+                                                disabled=ooc_task.startswith("Linear"))
+                with col2:
+                    ooc_chunk_rows = st.number_input("Rows per chunk:", 10_000, 5_000_000, 200_000, 50_000, key="ooc_chunk")
+                    ooc_batch = st.number_input("Mini-batch size:", 1, 100_000, 1_000, key="ooc_batch")
+                    ooc_epochs = st.number_input("Passes over the file:", 1, 20, 1, key="ooc_epochs")
+                    ooc_alpha = st.number_input("Regularization (alpha):", 0.0, 1.0, 1e-4, format="%.5f", key="ooc_alpha")
+                
+                if ooc_features and st.button("🚀 Train Out-of-Core"):
+                    is_regression = ooc_task.startswith("Linear")
+                    classes = None
+                    if not is_regression:
+                        with st.spinner("Scanning target classes..."):
+                            classes = parse_classes(ooc_classes) if ooc_classes.strip() else scan_classes(ooc_path, ooc_target)
+                    
+                    progress = st.progress(0.0)
+                    status = st.empty()
+                    curve_chart = st.empty()
+                    started = time.perf_counter()
+                    def show_chunk(rows, epoch, fraction, curve):
+                        progress.progress(min((epoch - 1 + fraction) / ooc_epochs, 1.0))
+                        status.write(f"Epoch {epoch}/{ooc_epochs} · {rows:,} rows · "
+                                     f"{rows / max(time.perf_counter() - started, 1e-9):,.0f} rows/sec")
+                        if curve:
+                            curve_chart.line_chart(pd.DataFrame(curve).set_index("rows")["score"])
+                    
+                    pipeline, curve, (y_last, y_pred_last), rows_seen = train_out_of_core(
+                        ooc_path, ooc_features, ooc_target, is_regression, classes, int(ooc_chunk_rows),
+                        int(ooc_batch), int(ooc_epochs), float(ooc_alpha), on_chunk=show_chunk)
+                    training_seconds = time.perf_counter() - started
+                    st.caption("Progressive validation score (R² or accuracy on each chunk before training on it)")
+                    
+                    stat = os.stat(ooc_path)
+                    scaler = pipeline.named_steps["scale"]
+                    model_type = "Linear Regression" if is_regression else "Logistic Regression"
+                    meta = {
+                        "model_type": model_type,
+                        "solver": "SGD partial_fit (out-of-core)",
+                        "features": list(ooc_features),
+                        "target": ooc_target,
+                        "inputs": list(ooc_features),
+                        "defaults": dict(zip(ooc_features, scaler.mean_.tolist())),
+                        "choices": {},
+                        "is_regression": is_regression,
+                        "metrics": evaluation_metrics(is_regression, y_last, y_pred_last),
+                        "training_seconds": round(training_seconds, 3),
+                        "data_hash": hashlib.sha256(f"{os.path.abspath(ooc_path)}|{stat.st_size}|{stat.st_mtime_ns}".encode()).hexdigest()[:32],
+                        "source": ooc_path,
+                        "rows_seen": rows_seen,
+                    }
+                    version = register_model(pipeline, None, meta, y_last, y_pred_last)
+                    st.session_state.model_version = version
+                    st.success(f"✅ Trained on {meta['rows_seen']:,} rows in {training_seconds:.1f}s. "
+                               f"Registered as version {version}")
+                    log_command(f"Trained out-of-core {model_type} on {ooc_path}")
+            
+            except Exception as e:
+                st.error(f"Error in out-of-core training: {e}")
     
     with tab4:
         st.subheader("🎯 Make Predictions")
         
-        if 'model' not in st.session_state:
+        models = list_models()
+        if not models:
             st.warning("Please train a model first in the 'Model Training' tab.")
         else:
-            model = st.session_state.model
-            model_type = st.session_state.model_type
+            meta, artifact = pick_model_version(models, "predict_version")
+            model = artifact["model"]
+            model_type = meta["model_type"]
             
             # Single prediction
             st.subheader("📝 Single Prediction")
             
-            if 'df_processed' in st.session_state:
-                df = st.session_state.df_processed
-                feature_cols = [col for col in df.select_dtypes(include=[np.number]).columns 
-                              if col != st.session_state.get('target_col', '')]
-                
-                # Create input form
-                input_data = {}
-                col1, col2 = st.columns(2)
-                
-                for i, col in enumerate(feature_cols):
-                    if i % 2 == 0:
-                        with col1:
-                            input_data[col] = st.number_input(f"Enter {col}:", value=float(df[col].mean()))
+            preprocessor = artifact["preprocessor"]
+            features = meta["features"]
+            input_cols = meta["inputs"]
+            defaults = meta["defaults"]
+            
+            # Inputs are raw values; the fitted preprocessing pipeline turns them into model features
+            input_data = dict(defaults)
+            col1, col2 = st.columns(2)
+            for i, col in enumerate(c for c in input_cols if c in features):
+                with col1 if i % 2 == 0 else col2:
+                    if col in meta["choices"]:
+                        choices = meta["choices"][col]
+                        index = choices.index(defaults[col]) if defaults[col] in choices else 0
+                        input_data[col] = st.selectbox(f"Select {col}:", choices, index=index)
                     else:
-                        with col2:
-                            input_data[col] = st.number_input(f"Enter {col}:", value=float(df[col].mean()))
+                        input_data[col] = st.number_input(f"Enter {col}:", value=float(defaults[col]))
+            
+            if st.button("🔮 Predict"):
+                input_df = pd.DataFrame([input_data])[input_cols]
+                prediction = model.predict(transform_features(preprocessor, input_df, features))[0]
                 
-                if st.button("🔮 Predict"):
-                    input_df = pd.DataFrame([input_data])
-                    prediction = model.predict(input_df)[0]
-                    
-                    if model_type in ["Linear Regression", "Random Forest"] and len(st.session_state.y_test.unique()) > 10:
-                        st.success(f"Predicted Value: {prediction:.2f}")
-                    else:
-                        st.success(f"Predicted Class: {prediction}")
+                if registered_is_regression(meta, model):
+                    st.success(f"Predicted Value: {prediction:.2f}")
+                else:
+                    st.success(f"Predicted Class: {prediction}")
             
             # Batch prediction
             st.subheader("📊 Batch Prediction")
@@ -283,20 +1146,52 @@ def machine_learning_section():
             
             if uploaded_pred_file is not None:
                 try:
-                    pred_df = pd.read_csv(uploaded_pred_file)
+                    uploaded_pred_file.seek(0)
                     st.write("Preview of prediction data:")
-                    st.dataframe(pred_df.head())
+                    st.dataframe(pd.read_csv(uploaded_pred_file, nrows=5))
+                    uploaded_pred_file.seek(0)
+                    
+                    col1, col2 = st.columns(2)
+                    with col1:
+                        batch_rows = st.number_input("Rows per chunk:", min_value=1_000, max_value=1_000_000,
+                                                     value=100_000, step=10_000)
+                    with col2:
+                        batch_workers = st.slider("Worker processes:", 1, os.cpu_count() or 1, min(4, os.cpu_count() or 1))
                     
                     if st.button("🔮 Predict Batch"):
-                        predictions = model.predict(pred_df)
-                        pred_df['Prediction'] = predictions
-                        st.success("Batch prediction completed!")
-                        st.dataframe(pred_df)
+                        previous = st.session_state.get('batch_predictions')
+                        if previous:
+                            for stale in (previous["path"], f"{previous['path']}.gz"):
+                                if os.path.exists(stale):
+                                    os.remove(stale)
+                        prune_predictions()
+                        os.makedirs(PREDICTIONS_DIR, exist_ok=True)
+                        out_path = os.path.join(PREDICTIONS_DIR, f"{meta['version']}-{uuid.uuid4().hex[:8]}.csv")
+                        
+                        progress = st.empty()
+                        def show_progress(rows, rate):
+                            progress.metric("Rows scored", f"{rows:,}", f"{rate:,.0f} rows/sec")
                         
-                        # Download predictions
-                        st.markdown(create_download_link(pred_df, "predictions.csv", "Download Predictions"), unsafe_allow_html=True)
+                        with st.spinner("Scoring in worker processes..."):
+                            rows, elapsed = stream_batch_predictions(uploaded_pred_file, meta, out_path, int(batch_rows),
+                                                                     batch_workers, show_progress)
+                        st.session_state.batch_predictions = {"path": out_path, "rows": rows, "elapsed": elapsed}
+                        st.success("Batch prediction completed!")
+                        log_command(f"Made batch predictions on {rows} samples")
+                    
+                    result = st.session_state.get('batch_predictions')
+                    if result and os.path.exists(result["path"]):
+                        st.metric("Throughput", f"{result['rows'] / max(result['elapsed'], 1e-9):,.0f} rows/sec",
+                                  f"{result['rows']:,} rows in {result['elapsed']:.1f}s", delta_color="off")
+                        st.dataframe(pd.read_csv(result["path"], nrows=20))
                         
-                        log_command(f"Made batch predictions on {len(pred_df)} samples")
+                        # Download predictions: the file is compressed and handed to the browser only
+                        # on request, never read into memory on ordinary reruns
+                        if st.button("📦 Prepare Download"):
+                            gz_path = compress_file(result["path"])
+                            with open(gz_path, "rb") as f:
+                                st.download_button(f"Download Predictions ({format_memory(os.path.getsize(gz_path))}, gzip)",
+                                                   f, file_name="predictions.csv.gz", mime="application/gzip")
                 
                 except Exception as e:
                     st.error(f"Error in batch prediction: {e}")
@@ -304,19 +1199,22 @@ def machine_learning_section():
     with tab5:
         st.subheader("📊 Model Evaluation")
         
-        if 'model' not in st.session_state:
+        models = list_models()
+        if not models:
             st.warning("Please train a model first in the 'Model Training' tab.")
         else:
-            model = st.session_state.model
-            y_test = st.session_state.y_test
-            y_pred = st.session_state.y_pred
-            model_type = st.session_state.model_type
+            meta, artifact = pick_model_version(models, "evaluate_version")
+            model = artifact["model"]
+            y_test = pd.Series(artifact["y_test"])
+            y_pred = artifact["y_pred"]
+            model_type = meta["model_type"]
+            is_regression = registered_is_regression(meta, model)
             
             # Metrics
             col1, col2, col3 = st.columns(3)
             
             with col1:
-                if model_type in ["Linear Regression", "Random Forest"] and len(y_test.unique()) > 10:
+                if is_regression:
                     mse = mean_squared_error(y_test, y_pred)
                     r2 = r2_score(y_test, y_pred)
                     st.metric("Mean Squared Error", f"{mse:.4f}")
@@ -327,16 +1225,11 @@ def machine_learning_section():
             
             with col2:
                 st.subheader("📈 Actual vs Predicted")
-                fig = px.scatter(x=y_test, y=y_pred, 
-                               title="Actual vs Predicted Values",
-                               labels={'x': 'Actual', 'y': 'Predicted'})
-                fig.add_trace(go.Scatter(x=[y_test.min(), y_test.max()], 
-                                       y=[y_test.min(), y_test.max()], 
-                                       mode='lines', name='Perfect Prediction'))
+                fig = actual_vs_predicted_figure(y_test, y_pred)
                 st.plotly_chart(fig, use_container_width=True)
             
             with col3:
-                if model_type not in ["Linear Regression"] and len(y_test.unique()) <= 10:
+                if not is_regression:
                     st.subheader("📊 Confusion Matrix")
                     classes = sorted(y_test.unique())
                     fig = plot_confusion_matrix(y_test, y_pred, classes)
@@ -351,7 +1244,7 @@ def machine_learning_section():
             if hasattr(model, 'feature_importances_'):
                 st.subheader("🎯 Feature Importance")
                 feature_importance = pd.DataFrame({
-                    'feature': st.session_state.df_processed[st.session_state.get('selected_features', [])].columns,
+                    'feature': meta["features"],
                     'importance': model.feature_importances_
                 }).sort_values('importance', ascending=False)
                 